@@ -0,0 +1,408 @@
+#!/usr/bin/env python
+# benchmark.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,R0913,R0914,W0212
+
+# Standard library imports
+from __future__ import print_function
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import stat
+import sys
+import tempfile
+import time
+
+# Intra-package imports
+from pre_commit_hooks import content, header, identity
+from pre_commit_hooks.header import check_header
+from pre_commit_hooks.identity import check_identity
+from pre_commit_hooks.pylint_codes import check_pylint_codes
+from pre_commit_hooks.spelling import check_spelling
+
+###
+# Global variables
+###
+_AUTHOR = ("Pablo Acosta-Serafini", "pmasdev@gmail.com")
+_HEADER = [
+    "{comment} {basename}",
+    r"{comment} Copyright \(c\) (2019-{current_year}|{current_year}) Pablo "
+    "Acosta-Serafini",
+    "{comment} See LICENSE for details",
+]
+_VOCABULARY = (
+    "about above after again against all also always another answer any around "
+    "because before began being below between both build came change check "
+    "code come could data default different directory does done down each "
+    "empty end enough even every example file files find first follow found "
+    "from function great group hand have header help here high home house "
+    "important input just keep kind know large last later left line lines list "
+    "little long look made make many might more most move much must name need "
+    "never next number often only open order other output over page parse part "
+    "path people place point program read right run same second should show "
+    "since small some sound spell start state still string such take tell test "
+    "text than that their them then there these thing think those though three "
+    "through time together turn under until value very want water well were "
+    "what when where which while white whole word words work world would write "
+    "year young"
+).split()
+# Hunspell pipe mode stand-in, words not in the dictionary are misspelled
+_STUB = """#!{python}
+import re
+import sys
+args = sys.argv[1:]
+known = set(open({words!r}).read().split())
+if "-p" in args:
+    known.update(open(args[args.index("-p") + 1]).read().splitlines()[1:])
+regexp = re.compile(r"[A-Za-z]+")
+out = sys.stdout
+out.write("@(#) International Ispell Version 3.2.06 (but really Hunspell)\\n")
+out.flush()
+terse = False
+for line in iter(sys.stdin.readline, ""):
+    line = line.rstrip("\\n")
+    if line == "!":
+        terse = True
+        continue
+    line = line[1:] if line.startswith("^") else line
+    for match in regexp.finditer(line):
+        word = match.group(0)
+        if (word not in known) and (word.lower() not in known):
+            out.write("# {{0}} {{1}}\\n".format(word, match.start()))
+        elif not terse:
+            out.write("*\\n")
+    out.write("\\n")
+    out.flush()
+"""
+
+
+###
+# Functions
+###
+def _clear_memos():
+    """Forget per-run memos, so that every run pays the cost of a new process."""
+    content.clear()
+    for memo in [
+        header._HEADER_REFS,
+        header._HEADER_REGEXPS,
+        header._HEADER_TEXTS,
+        identity._AUTHORS,
+    ]:
+        memo.clear()
+
+
+def _differences(baseline, params):
+    """Return parameters of a run that differ from those of a baseline run."""
+    ref = baseline.get("parameters", {})
+    return [
+        "{0}={1} (baseline {2})".format(name, value, ref.get(name, "unknown"))
+        for name, value in sorted(params.items())
+        if ref.get(name) != value
+    ]
+
+
+def _header_lines(rnd, fname, comment, variation):
+    """Return header lines of a synthetic file."""
+    basename = os.path.basename(fname)
+    lines = [
+        "{0} {1}".format(comment, basename),
+        "{0} Copyright (c) 2019-{1} {2}".format(
+            comment, time.localtime().tm_year, _AUTHOR[0]
+        ),
+        "{0} See LICENSE for details".format(comment),
+    ]
+    if rnd.random() >= variation:
+        return lines
+    # Non-compliant header: missing line, wrong year or wrong file name
+    choice = rnd.randint(0, 2)
+    if choice == 0:
+        del lines[rnd.randint(0, 2)]
+    elif choice == 1:
+        lines[1] = "{0} Copyright (c) 2001 {1}".format(comment, _AUTHOR[0])
+    else:
+        lines[0] = "{0} other_{1}".format(comment, basename)
+    return lines
+
+
+def _misspell(rnd, word):
+    """Return a misspelled version of a word."""
+    pos = rnd.randint(0, len(word) - 2)
+    return word[:pos] + word[pos + 1] + word[pos] + word[pos + 2 :] + "q"
+
+
+def _pylint_line(rnd, num, variation):
+    """Return a Pylint disable directive, with codes unique to the line."""
+    codes = ["W{0:04d}".format(10 * num + item) for item in range(rnd.randint(1, 3))]
+    if rnd.random() < variation:
+        # Unsorted or repeated codes
+        codes = codes[::-1] + codes[:1]
+    return "# pylint: disable={0}".format(",".join(codes))
+
+
+def _sentence(rnd, misspell):
+    """Return a line of prose with the given misspelled word density."""
+    words = [rnd.choice(_VOCABULARY) for _ in range(rnd.randint(6, 12))]
+    return " ".join(
+        _misspell(rnd, word) if rnd.random() < misspell else word for word in words
+    )
+
+
+def _write_file(rnd, fname, nlines, misspell, variation):
+    """Write synthetic file of a given type."""
+    ext = os.path.splitext(fname)[1]
+    comment = ".." if ext == ".rst" else "#"
+    lines = ["#!/usr/bin/env python"] if ext == ".py" else []
+    lines += ["#!/bin/bash"] if ext == ".sh" else []
+    lines += _header_lines(rnd, fname, comment, variation)
+    for num in range(nlines):
+        text = _sentence(rnd, misspell)
+        if ext == ".py":
+            if not num % 10:
+                lines.append(_pylint_line(rnd, num, variation))
+            lines.append(
+                "# {0}".format(text)
+                if num % 2
+                else 'var_{0} = "{1}"  # noqa'.format(num, text)
+            )
+        elif ext == ".rst":
+            lines.append(text if num % 8 else ".. code-block:: python")
+            lines.extend(["", "    x = 1", ""] if not num % 8 else [])
+        elif ext == ".sh":
+            lines.append("# {0}".format(text) if num % 2 else "echo done")
+        else:
+            lines.append("key_{0} = {1}".format(num, text) if num % 2 else "[s]")
+    with open(fname, "w") as fobj:
+        fobj.write("\n".join(lines) + "\n")
+
+
+def make_tree(root, nfiles, nlines, misspell=0.02, variation=0.1, seed=0):
+    """
+    Generate a synthetic repository and return the names of its files.
+
+    Files are a mix of Python, reStructuredText, shell and configuration files
+    with nlines lines of prose each; misspell is the fraction of misspelled
+    words and variation the fraction of non-compliant headers and Pylint
+    directives
+    """
+    rnd = random.Random(seed)
+    exts = [".py", ".py", ".rst", ".sh", ".cfg"]
+    fnames = []
+    for num in range(nfiles):
+        sdir = os.path.join(root, "pkg{0}".format(num // 100))
+        if not os.path.isdir(sdir):
+            os.makedirs(sdir)
+        fname = os.path.join(sdir, "file{0}{1}".format(num, exts[num % len(exts)]))
+        _write_file(rnd, fname, nlines, misspell, variation)
+        fnames.append(fname)
+    with open(os.path.join(root, ".headerrc"), "w") as fobj:
+        fobj.write("\n".join(_HEADER) + "\n")
+    with open(os.path.join(root, "AUTHORS.rst"), "w") as fobj:
+        fobj.write("Authors\n=======\n\n")
+        for num in range(200):
+            fobj.write("* Author {0} <author{0}@example.com>\n".format(num))
+        fobj.write("* {0} <{1}>\n".format(*_AUTHOR))
+    if not os.path.isdir(os.path.join(root, ".git")):
+        os.makedirs(os.path.join(root, ".git"))
+        with open(os.path.join(root, ".git", "config"), "w") as fobj:
+            fobj.write("[user]\n\tname = {0}\n\temail = {1}\n".format(*_AUTHOR))
+    return fnames
+
+
+def make_stub(sdir):
+    """Write Hunspell stand-in, return directory to prepend to PATH."""
+    words_fname = os.path.join(sdir, "words.txt")
+    with open(words_fname, "w") as fobj:
+        fobj.write("\n".join(_VOCABULARY) + "\n")
+    fname = os.path.join(sdir, "hunspell")
+    with open(fname, "w") as fobj:
+        fobj.write(_STUB.format(python=sys.executable, words=words_fname))
+    os.chmod(fname, os.stat(fname).st_mode | stat.S_IXUSR)
+    return sdir
+
+
+def _time_entry(func, argv, repeat, warmup=False):
+    """Return wall times of runs of an entry point, output discarded."""
+    times = []
+    with open(os.devnull, "w") as devnull:
+        if warmup:
+            with _redirect(devnull):
+                func(argv)
+        for _ in range(repeat):
+            _clear_memos()
+            start = time.time()
+            with _redirect(devnull):
+                func(argv)
+            times.append(time.time() - start)
+    return sorted(times)
+
+
+@contextlib.contextmanager
+def _redirect(fobj):
+    """Redirect standard output to file object."""
+    stdout = sys.stdout
+    sys.stdout = fobj
+    try:
+        yield
+    finally:
+        sys.stdout = stdout
+
+
+def _parameters(args):
+    """Return parameters of a run, only runs with the same ones are compared."""
+    return {
+        "files": [int(item) for item in args.files.split(",")],
+        "hunspell": bool(args.hunspell),
+        "jobs": args.jobs,
+        "lines": args.lines,
+        "misspell": args.misspell,
+        "repeat": args.repeat,
+        "variation": args.variation,
+    }
+
+
+def _scenarios(root, fnames, cache_dir, jobs):
+    """Return (name, entry point, arguments, warm-up run) of benchmarks."""
+    authors = os.path.join(root, "AUTHORS.rst")
+    pyfiles = [fname for fname in fnames if fname.endswith(".py")]
+    jobs = ["--jobs", str(jobs)]
+    return [
+        ("check_header", check_header, jobs + fnames, False),
+        ("check_pylint_codes", check_pylint_codes, pyfiles, False),
+        (
+            "check_spelling",
+            check_spelling,
+            ["--no-cache", "--jobs", "1"] + fnames,
+            False,
+        ),
+        ("check_spelling_jobs", check_spelling, ["--no-cache"] + jobs + fnames, False),
+        (
+            "check_spelling_warm",
+            check_spelling,
+            ["--cache-dir", cache_dir] + jobs + fnames,
+            True,
+        ),
+        ("check_identity", check_identity, ["-a", authors], False),
+    ]
+
+
+def run_benchmarks(sizes, nlines, repeat, misspell, variation, use_hunspell, jobs):
+    """Generate trees of each size and time every entry point on them."""
+    results = {}
+    cwd = os.getcwd()
+    path = os.environ.get("PATH", "")
+    for nfiles in sizes:
+        root = tempfile.mkdtemp(prefix="pch-bench-")
+        try:
+            fnames = make_tree(root, nfiles, nlines, misspell, variation)
+            if not use_hunspell:
+                os.environ["PATH"] = make_stub(root) + os.pathsep + path
+            os.chdir(root)
+            cache_dir = os.path.join(root, ".cache")
+            for name, func, argv, warmup in _scenarios(root, fnames, cache_dir, jobs):
+                times = _time_entry(func, argv, repeat, warmup)
+                key = "{0}/files={1}".format(name, nfiles)
+                results[key] = {
+                    "min": round(times[0], 6),
+                    "median": round(times[len(times) // 2], 6),
+                }
+                print("{0:<40} {1:>10.4f}s".format(key, times[len(times) // 2]))
+        finally:
+            os.chdir(cwd)
+            os.environ["PATH"] = path
+            shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def compare(baseline, results, tolerance, min_delta):
+    """
+    Print comparison against baseline, return whether there are regressions.
+
+    Best times are compared, a benchmark regresses if it is slower by more than
+    the relative tolerance and by more than min_delta seconds
+    """
+    regressions = False
+    for key in sorted(results):
+        if key not in baseline:
+            continue
+        old, new = baseline[key]["min"], results[key]["min"]
+        ratio = new / old if old else 1.0
+        flag = ""
+        if (ratio > 1 + tolerance) and (new - old > min_delta):
+            flag, regressions = "REGRESSION", True
+        print(
+            "{0:<40} {1:>10.4f}s {2:>10.4f}s {3:>7.2f}x {4}".format(
+                key, old, new, ratio, flag
+            )
+        )
+    return regressions
+
+
+def main(argv=None):
+    """Script entry point."""
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(description="Benchmark hook entry points")
+    parser.add_argument("--files", default="10,100,500", help="Tree sizes")
+    parser.add_argument("--lines", type=int, default=100, help="Lines per file")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--misspell", type=float, default=0.02)
+    parser.add_argument("--variation", type=float, default=0.1)
+    parser.add_argument(
+        "--jobs", type=int, default=2, help="Jobs of multi-process hook runs"
+    )
+    parser.add_argument(
+        "--hunspell", action="store_true", help="Use Hunspell instead of a stub"
+    )
+    parser.add_argument("-o", "--output", help="Write results to JSON file")
+    parser.add_argument(
+        "-c",
+        "--compare",
+        help="Compare against JSON baseline, such as bin/benchmark_baseline.json",
+    )
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--min-delta", type=float, default=0.005)
+    args = parser.parse_args(argv)
+    params = _parameters(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as fobj:
+            baseline = json.load(fobj)
+        # Times of runs with other parameters are not comparable
+        differ = _differences(baseline, params)
+        if differ:
+            parser.error(
+                "baseline {0} was run with other parameters: {1}".format(
+                    args.compare, ", ".join(differ)
+                )
+            )
+    results = run_benchmarks(
+        params["files"],
+        args.lines,
+        args.repeat,
+        args.misspell,
+        args.variation,
+        args.hunspell,
+        args.jobs,
+    )
+    if args.output:
+        data = {
+            "parameters": params,
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "results": results,
+        }
+        with open(args.output, "w") as fobj:
+            json.dump(data, fobj, indent=2, sort_keys=True)
+    if (baseline is not None) and compare(
+        baseline["results"], results, args.tolerance, args.min_delta
+    ):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
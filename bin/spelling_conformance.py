@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# spelling_conformance.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111
+
+# Standard library imports
+from __future__ import print_function
+import argparse
+import sys
+
+# Intra-package imports
+from pre_commit_hooks import content, spelling
+from pre_commit_hooks.compat import which
+from pre_commit_hooks.spelling import _Hunspell, _builtin_speller
+
+
+###
+# Functions
+###
+def _words(fnames, extract):
+    """Return unique white space-separated words of files, in order."""
+    ret, seen = [], set()
+    for fname in fnames:
+        for _, line in spelling._file_lines(fname, extract=extract):
+            for word in line.split():
+                if word not in seen:
+                    seen.add(word)
+                    ret.append(word)
+    return ret
+
+
+def compare(words, names, personal=None):
+    """Return words Hunspell and the built-in engine disagree on."""
+    cmd = ["hunspell", "-d", names] + (["-p", personal] if personal else []) + ["-a"]
+    with _Hunspell(cmd) as session:
+        reference = session.check(words)
+    with _builtin_speller(names, personal) as speller:
+        builtin = speller.check(words)
+    return [
+        (word, sorted(expected), sorted(actual))
+        for word, expected, actual in zip(words, reference, builtin)
+        if sorted(expected) != sorted(actual)
+    ]
+
+
+def main(argv=None):
+    """Compare built-in engine verdicts against Hunspell."""
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(
+        description="Compare built-in spelling engine against Hunspell"
+    )
+    parser.add_argument("-d", default="en_US", help="Dictionaries")
+    parser.add_argument("-p", help="Personal dictionary")
+    parser.add_argument("--full-text", action="store_true")
+    parser.add_argument(
+        "--threshold", type=float, default=0.99, help="Minimum agreement rate"
+    )
+    parser.add_argument("-v", "--verbose", action="store_true")
+    parser.add_argument("files", nargs="+")
+    args = parser.parse_args(argv)
+    if not which("hunspell"):
+        print("hunspell not found", file=sys.stderr)
+        return 1
+    words = _words(args.files, not args.full_text)
+    mismatches = compare(words, args.d, args.p)
+    if args.verbose:
+        for word, expected, actual in mismatches:
+            print(
+                "{0}: hunspell {1}, builtin {2}".format(
+                    word, " ".join(expected) or "-", " ".join(actual) or "-"
+                )
+            )
+    rate = 1.0 - float(len(mismatches)) / max(1, len(words))
+    print(
+        "{0} words, {1} mismatches, {2:.2%} agreement".format(
+            len(words), len(mismatches), rate
+        )
+    )
+    content.clear()
+    return 0 if rate >= args.threshold else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
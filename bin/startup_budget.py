@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# startup_budget.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111
+
+# Standard library imports
+from __future__ import print_function
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# Intra-package imports
+from pre_commit_hooks import client
+
+###
+# Global variables
+###
+_SETUP = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "setup.py"
+)
+# Import time budgets of entry point modules, in milliseconds, as measured by
+# python -X importtime (interpreter start-up itself is not included). They
+# are the import times of the c5fea05 entry points (header 14 ms,
+# pylint_codes 11 ms, identity 17 ms, spelling 39 ms) plus a 25% margin.
+# Entry points added since then, and pydocstyle_wrapper, which imported
+# pydocstyle itself at c5fea05, get their import time relative to the
+# c5fea05 header on the same host plus the same margin
+_BUDGETS = {
+    "checker_daemon": 19,
+    "git_pre_commit": 26,
+    "header": 18,
+    "identity": 21,
+    "pydocstyle_wrapper": 28,
+    "pylint_codes": 14,
+    "run_hooks": 17,
+    "spelling": 49,
+    "whitelist": 24,
+}
+# Modules no entry point may import at start-up, they are only needed once
+# work is under way (or only by the daemon itself)
+_DEFERRED = (
+    "difflib",
+    "importlib.metadata",
+    "multiprocessing",
+    "pre_commit_hooks.dictionary",
+    "pre_commit_hooks.staged",
+    "pydocstyle",
+    "traceback",
+)
+
+
+###
+# Functions
+###
+def _entry_points():
+    """
+    Return console scripts of the package and the modules they import.
+
+    Scripts of the hook client import the hook module when no daemon is
+    running, which is what is measured for them
+    """
+    hooks = dict((func, module) for module, func in client.HOOKS.values())
+    with open(_SETUP) as fobj:
+        text = fobj.read()
+    ret = []
+    for name, module, func in re.findall(
+        r"[\"'](\w+)\s*=\s*(pre_commit_hooks\.\w+):(\w+)[\"']", text
+    ):
+        if module == client.__name__:
+            module = "pre_commit_hooks." + hooks[func]
+        ret.append((name, module))
+    return sorted(ret)
+
+
+def _import_times(module):
+    """Return cumulative import time, in microseconds, of modules imported."""
+    # Byte-compiled files have to be written for the runs measured to use them
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    obj = subprocess.Popen(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=env,
+    )
+    _, stderr = obj.communicate()
+    if obj.returncode:
+        raise RuntimeError(stderr.decode("utf-8", "replace").rstrip())
+    ret = {}
+    for line in stderr.decode("utf-8", "replace").splitlines():
+        fields = line.split("|")
+        if line.startswith("import time:") and fields[1].strip().isdigit():
+            ret[fields[2].strip()] = int(fields[1])
+    return ret
+
+
+def measure(module, repeat):
+    """Return median import time (ms) of a module and the modules it imports."""
+    # First run writes byte-compiled files, it is not measured
+    _import_times(module)
+    runs = [_import_times(module) for _ in range(repeat)]
+    times = sorted(run.get(module, 0) for run in runs)
+    return times[len(times) // 2] / 1000.0, set(runs[0])
+
+
+def main(argv=None):
+    """Check import time of entry points against their budgets."""
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(
+        description="Check entry point start-up time against budgets"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="Budget multiplier for slow hosts"
+    )
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    retval = 0
+    for name, module in _entry_points():
+        budget = _BUDGETS.get(name)
+        if budget is None:
+            print("{0}: no start-up budget".format(name))
+            retval = 1
+            continue
+        elapsed, modules = measure(module, args.repeat)
+        budget *= args.scale
+        deferred = sorted(
+            item
+            for item in modules
+            if any(item == mod or item.startswith(mod + ".") for mod in _DEFERRED)
+        )
+        status = "ok"
+        if (elapsed > budget) or deferred:
+            status, retval = "FAIL", 1
+        print(
+            "{0:20} {1:7.1f} ms (budget {2:5.1f} ms) {3}".format(
+                name, elapsed, budget, status
+            )
+        )
+        if deferred and (args.verbose or status != "ok"):
+            print("    imports deferred modules: {0}".format(", ".join(deferred)))
+    return retval
+
+
+if __name__ == "__main__":
+    sys.exit(main())
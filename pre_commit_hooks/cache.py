@@ -0,0 +1,184 @@
+# cache.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,C0415,R0205
+
+# Standard library imports
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Intra-package imports
+from pre_commit_hooks import content
+from pre_commit_hooks.client import git_dir
+
+###
+# Global variables
+###
+# Caches opened in this process, keyed by file name, so that long-lived
+# processes keep their entries in memory between runs
+_CACHES = {}
+
+
+###
+# Functions
+###
+def default_dir(name):
+    """Return per-repository cache directory of a hook, empty if none."""
+    sdir = git_dir()
+    return os.path.join(sdir, "pre-commit-hooks", name) if sdir else ""
+
+
+def digest(*items):
+    """Return hexadecimal SHA1 digest of a sequence of strings or bytes."""
+    obj = hashlib.sha1()
+    for item in items:
+        item = item if isinstance(item, bytes) else item.encode("utf-8")
+        obj.update(str(len(item)).encode("ascii") + b":" + item)
+    return obj.hexdigest()
+
+
+def file_digest(fname):
+    """Return hexadecimal SHA1 digest of a file contents, empty if unreadable."""
+    obj = content.get(fname)
+    if obj is None:
+        return ""
+    # Same digest as digest(contents), without copying memory-mapped files
+    hobj = hashlib.sha1()
+    hobj.update(str(obj.size).encode("ascii") + b":")
+    hobj.update(obj.data)
+    return hobj.hexdigest()
+
+
+def open_cache(fname, max_entries=10000):
+    """Return cache of a file, shared by all runs in the process."""
+    key = os.path.abspath(fname)
+    obj = _CACHES.get(key)
+    if obj is None:
+        obj = LruCache(fname, max_entries)
+        _CACHES[key] = obj
+    obj.touch(max_entries)
+    return obj
+
+
+def remove_stale(fname, pattern):
+    """
+    Remove the other cache files of a directory that match a wildcard pattern.
+
+    Used when a cache file named after a configuration fingerprint replaces
+    the files of earlier configurations
+    """
+    import glob
+
+    keep = os.path.abspath(fname)
+    for other in glob.glob(os.path.join(os.path.dirname(keep), pattern)):
+        other = os.path.abspath(other)
+        if other != keep:
+            _CACHES.pop(other, None)
+            try:
+                os.remove(other)
+            except (IOError, OSError):
+                pass
+
+
+def _replace(src, dest):
+    """Rename file, replacing destination atomically."""
+    # os.replace is not available in Python 2
+    getattr(os, "replace", os.rename)(src, dest)
+
+
+class LruCache(object):
+    """
+    Persistent key/value store with least-recently-used eviction.
+
+    Entries are kept in a JSON file as [timestamp, value] pairs; the file is
+    read the first time the cache is accessed and written back atomically by
+    save, merging entries written by concurrent runs in the meantime. The
+    cache is memory-only if the file name is None
+    """
+
+    def __init__(self, fname, max_entries=10000):  # noqa
+        self._fname = fname
+        self._max_entries = max_entries
+        self._stamp = int(time.time())
+        self._dirty = False
+        self._entries = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):  # noqa
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):  # noqa
+        self.save()
+        return not exc_type is not None
+
+    def _load(self):
+        """Read entries from cache file."""
+        if self._fname is None:
+            return {}
+        try:
+            with open(self._fname, "r") as fobj:
+                entries = json.load(fobj)
+        except (IOError, OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def touch(self, max_entries=None):
+        """Start a new run, entries used from now on get the current time."""
+        with self._lock:
+            self._stamp = int(time.time())
+            self._max_entries = max_entries or self._max_entries
+            self.hits = self.misses = 0
+
+    def get(self, key):
+        """Return cached value of a key, None if not in cache."""
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if entry[0] != self._stamp:
+                entry[0] = self._stamp
+                self._dirty = True
+            return entry[1]
+
+    def put(self, key, value):
+        """Store value of a key."""
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+            self._entries[key] = [self._stamp, value]
+            self._dirty = True
+
+    def save(self):
+        """Write entries to cache file, evicting least recently used ones."""
+        if (not self._dirty) or (self._fname is None):
+            return
+        entries = self._load()
+        for key, entry in self._entries.items():
+            if (key not in entries) or (entries[key][0] <= entry[0]):
+                entries[key] = entry
+        if len(entries) > self._max_entries:
+            keys = sorted(entries, key=lambda x: entries[x][0], reverse=True)
+            entries = dict((key, entries[key]) for key in keys[: self._max_entries])
+        cache_dir = os.path.dirname(os.path.abspath(self._fname))
+        import tempfile
+
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            fdesc, tmp_fname = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fdesc, "w") as fobj:
+                json.dump(entries, fobj, separators=(",", ":"))
+            _replace(tmp_fname, self._fname)
+        except (IOError, OSError):
+            return
+        self._entries = entries
+        self._dirty = False
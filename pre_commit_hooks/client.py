@@ -0,0 +1,288 @@
+# client.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,C0415
+
+# Standard library imports
+import os
+import stat
+import sys
+
+###
+# Global variables
+###
+# Hooks that can run in the checker daemon, by name, with their module and
+# entry point
+HOOKS = {
+    "header": ("header", "check_header"),
+    "identity": ("identity", "check_identity"),
+    "pydocstyle": ("pydocstyle_wrapper", "check_pydocstyle"),
+    "pylint_codes": ("pylint_codes", "check_pylint_codes"),
+    "runner": ("runner", "run_hooks"),
+    "spelling": ("spelling", "check_spelling"),
+}
+# Seconds a client waits to connect to the daemon
+_CONNECT_TIMEOUT = 1
+# Unix socket paths longer than this do not fit in a socket address on all
+# platforms
+_MAX_PATH = 100
+# Environment variables hook runs depend on, by name and by prefix; only
+# these are sent to the daemon
+_ENV_NAMES = (
+    "DICPATH",
+    "DICTIONARY",
+    "EMAIL",
+    "HOME",
+    "LANG",
+    "LANGUAGE",
+    "PATH",
+    "PYTHONPATH",
+    "TMPDIR",
+    "WORDLIST",
+    "XDG_CONFIG_HOME",
+)
+_ENV_PREFIXES = ("GIT_", "LC_", "PRE_COMMIT_HOOKS_")
+
+
+###
+# Functions
+###
+def _code_stamp():
+    """Return digest of the interpreter and package sources this process runs."""
+    import hashlib
+
+    pkg_dir = os.path.dirname(os.path.abspath(__file__))
+    items = [sys.executable, sys.version]
+    for name in sorted(os.listdir(pkg_dir)):
+        if name.endswith(".py"):
+            fstat = os.stat(os.path.join(pkg_dir, name))
+            items.append("{0} {1} {2}".format(name, fstat.st_size, fstat.st_mtime))
+    return hashlib.sha1("\n".join(items).encode("utf-8")).hexdigest()
+
+
+def _connect():
+    """
+    Return socket connected to the daemon, None if it is not running.
+
+    Only a socket owned by the current user is connected to, hook runs are
+    never sent to a process of another user. The socket module is only
+    imported once the socket file is found
+    """
+    path = "" if os.environ.get("PRE_COMMIT_HOOKS_NO_DAEMON") else socket_path()
+    if not path:
+        return None
+    try:
+        fstat = os.lstat(path)
+    except (IOError, OSError):
+        return None
+    if (not stat.S_ISSOCK(fstat.st_mode)) or (not _owned(fstat)):
+        return None
+    import socket
+
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(_CONNECT_TIMEOUT)
+        sock.connect(path)
+    except (IOError, OSError, socket.error):
+        sock.close()
+        return None
+    return sock
+
+
+def _environment():
+    """Return the environment variables hook runs depend on."""
+    return dict((name, value) for name, value in os.environ.items() if _relevant(name))
+
+
+def _exchange(sock, payload):
+    """Send a request through a connected socket and close it, return reply."""
+    import json
+
+    try:
+        # Hooks take as long as they take
+        sock.settimeout(None)
+        sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+        data = _read_line(sock)
+    except (IOError, OSError):
+        return None
+    finally:
+        sock.close()
+    try:
+        return json.loads(data.decode("utf-8"))
+    except ValueError:
+        return None
+
+
+def _owned(fstat):
+    """Return whether a file is owned by the current user."""
+    return (not hasattr(os, "getuid")) or (fstat.st_uid == os.getuid())
+
+
+def _private_dir():
+    """
+    Return per-user directory in the temporary directory, empty if unsafe.
+
+    The directory is created readable by its owner only; an existing one is
+    used only if it is a directory, not a link, owned by the current user and
+    not accessible by anyone else
+    """
+    import tempfile
+
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    path = os.path.join(tempfile.gettempdir(), "pre-commit-hooks-{0}".format(uid))
+    try:
+        os.mkdir(path, 0o700)
+    except (IOError, OSError):
+        pass
+    try:
+        fstat = os.lstat(path)
+    except (IOError, OSError):
+        return ""
+    if (
+        (not stat.S_ISDIR(fstat.st_mode))
+        or (not _owned(fstat))
+        or (fstat.st_mode & 0o077)
+    ):
+        return ""
+    return path
+
+
+def _read_line(sock):
+    """Read a newline-terminated message from a socket."""
+    chunks = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        if chunk.endswith(b"\n"):
+            break
+    return b"".join(chunks)
+
+
+def _relevant(name):
+    """Return whether hook runs depend on an environment variable."""
+    return (name in _ENV_NAMES) or name.startswith(_ENV_PREFIXES)
+
+
+def _run(hook, argv):
+    """
+    Run hook in the daemon, if it is running, or in this process.
+
+    The arguments, working directory and environment are sent to the daemon
+    of the repository, which replies with the output and exit code of the
+    hook; the hook module is only imported if there is no daemon, the daemon
+    is out of date or the connection fails
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    # Nothing else is done unless the daemon is running
+    sock = _connect()
+    reply = sock and _exchange(
+        sock,
+        {
+            "command": "run",
+            "hook": hook,
+            "argv": argv,
+            "prog": sys.argv[0] if sys.argv else "",
+            "cwd": os.getcwd(),
+            "env": _environment(),
+            "stamp": _code_stamp(),
+        },
+    )
+    if reply and ("retval" in reply):
+        sys.stdout.write(_tostr(reply["stdout"]))
+        sys.stderr.write(_tostr(reply["stderr"]))
+        return reply["retval"]
+    import importlib
+
+    module, func = HOOKS[hook]
+    return getattr(importlib.import_module("pre_commit_hooks." + module), func)(argv)
+
+
+def _tostr(text):  # pragma: no cover
+    """Convert Unicode text of a reply to the native string type."""
+    return text if isinstance(text, str) else text.encode("utf-8")
+
+
+def check_header(argv=None):
+    """Header hook entry point."""
+    return _run("header", argv)
+
+
+def check_identity(argv=None):
+    """Git identity hook entry point."""
+    return _run("identity", argv)
+
+
+def check_pydocstyle(argv=None):
+    """PEP257 compliance hook entry point."""
+    return _run("pydocstyle", argv)
+
+
+def check_pylint_codes(argv=None):
+    """Pylint disable directives hook entry point."""
+    return _run("pylint_codes", argv)
+
+
+def check_spelling(argv=None):
+    """Spelling hook entry point."""
+    return _run("spelling", argv)
+
+
+def git_dir(path=None):
+    """Return Git directory of the repository path is in, empty if none."""
+    curr_dir = ""
+    next_dir = os.path.abspath(path or os.getcwd())
+    while next_dir != curr_dir:
+        curr_dir = next_dir
+        dot_git = os.path.join(curr_dir, ".git")
+        if os.path.isdir(dot_git):
+            return dot_git
+        if os.path.isfile(dot_git):
+            # Worktrees and submodules have a .git file pointing to the
+            # actual Git directory
+            with open(dot_git, "r") as fobj:
+                line = fobj.readline().strip()
+            if line.startswith("gitdir:"):
+                return os.path.join(curr_dir, line[len("gitdir:") :].strip())
+        next_dir = os.path.dirname(curr_dir)
+    return ""
+
+
+def request(payload):
+    """Send a request to the daemon, return its reply, None if not running."""
+    sock = _connect()
+    return None if sock is None else _exchange(sock, payload)
+
+
+def run_hooks(argv=None):
+    """Run hooks, entry point."""
+    return _run("runner", argv)
+
+
+def socket_path():
+    """
+    Return daemon socket path of the current repository, empty if none.
+
+    The socket is in the Git directory, or in a per-user directory of the
+    temporary directory if that path would be too long for a socket address.
+    The PRE_COMMIT_HOOKS_SOCKET environment variable overrides it
+    """
+    path = os.environ.get("PRE_COMMIT_HOOKS_SOCKET", "")
+    if path:
+        return path
+    sdir = git_dir()
+    if not sdir:
+        return ""
+    path = os.path.join(os.path.abspath(sdir), "pre-commit-hooks", "daemon.sock")
+    if len(path) > _MAX_PATH:
+        import hashlib
+
+        tmp_dir = _private_dir()
+        if not tmp_dir:
+            return ""
+        name = hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
+        path = os.path.join(tmp_dir, "{0}.sock".format(name))
+    return path
@@ -0,0 +1,86 @@
+# compat.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,C0415
+
+# Standard library imports
+import os
+import sys
+
+###
+# Functions
+###
+# Literal copy from [...]/site-packages/pip/_vendor/compat.py, implementation
+# from Python 3.3
+def _which(cmd, mode=os.F_OK | os.X_OK, path=None):
+    """Mimic CLI which function, copied from Python 3.3 implementation."""
+    # pylint: disable=C0113,W0622
+    # Check that a given file can be accessed with the correct mode.
+    # Additionally check that `file` is not a directory, as on Windows
+    # directories pass the os.access check.
+    def _access_check(fn, mode):
+        return os.path.exists(fn) and os.access(fn, mode) and not os.path.isdir(fn)
+
+    # If we're given a path with a directory part, look it up directly rather
+    # than referring to PATH directories. This includes checking relative to the
+    # current directory, e.g. ./script
+    if os.path.dirname(cmd):
+        if _access_check(cmd, mode):
+            return cmd
+        return None
+
+    if path is None:
+        path = os.environ.get("PATH", os.defpath)
+    if not path:
+        return None
+    path = path.split(os.pathsep)
+
+    if sys.platform == "win32":
+        # The current directory takes precedence on Windows.
+        if not os.curdir in path:
+            path.insert(0, os.curdir)
+
+        # PATHEXT is necessary to check on Windows.
+        pathext = os.environ.get("PATHEXT", "").split(os.pathsep)
+        # See if the given file matches any of the expected path extensions.
+        # This will allow us to short circuit when given "python.exe".
+        # If it does match, only test that one, otherwise we have to try
+        # others.
+        if any(cmd.lower().endswith(ext.lower()) for ext in pathext):
+            files = [cmd]
+        else:
+            files = [cmd + ext for ext in pathext]
+    else:
+        # On other platforms you don't have things like PATHEXT to tell you
+        # what file suffixes are executable, so just pass on cmd as-is.
+        files = [cmd]
+
+    seen = set()
+    for dir in path:
+        normdir = os.path.normcase(dir)
+        if not normdir in seen:
+            seen.add(normdir)
+            for thefile in files:
+                name = os.path.join(dir, thefile)
+                if _access_check(name, mode):
+                    return name
+    return None
+
+
+def cpu_count():
+    """Return number of CPUs, without importing multiprocessing in Python 3."""
+    count = getattr(os, "cpu_count", None)
+    if count is None:  # pragma: no cover
+        import multiprocessing
+
+        return multiprocessing.cpu_count()
+    return count() or 1
+
+
+def which(cmd, mode=os.F_OK | os.X_OK, path=None):
+    """Return path of a command, None if not found; shutil is imported on use."""
+    try:
+        from shutil import which as shutil_which
+    except ImportError:  # pragma: no cover
+        shutil_which = _which
+    return shutil_which(cmd, mode, path)
@@ -0,0 +1,332 @@
+# content.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,C0415,R0205
+
+# Standard library imports
+import collections
+import io
+import os
+import re
+import sys
+
+try:
+    from _thread import RLock
+except ImportError:  # pragma: no cover
+    from threading import RLock
+
+# Intra-package imports
+from pre_commit_hooks import timings
+
+###
+# Global variables
+###
+IS_PY3 = sys.hexversion > 0x03000000
+# Files at least this big are memory-mapped instead of read
+_MMAP_SIZE = 1 << 20
+# Bytes looked at to tell whether a file is binary
+_BINARY_PREFIX = 8192
+# Maximum number of bytes and of files memoized, not counting preloaded
+# files; least recently used files are dropped first
+_MEMO_BYTES = 64 << 20
+_MEMO_FILES = 256
+# Universal newlines, as in files opened in text mode
+_NEWLINE_REGEXP = re.compile(b"\r\n|\r|\n")
+# Per-run memo of file contents and of file existence, keyed by absolute
+# file name
+_CONTENTS = collections.OrderedDict()
+_EXISTS = {}
+_PINNED = set()
+# Reentrant lock of the interpreter core, Python 3 hooks that do not start
+# threads do not import the threading module for it
+_LOCK = RLock()
+_MEMO = {"bytes": 0}
+
+
+###
+# Functions
+###
+def _evict():
+    """Drop least recently used contents that are not pinned, lock held."""
+    for fname in list(_CONTENTS):
+        if (_MEMO["bytes"] <= _MEMO_BYTES) and (
+            len(_CONTENTS) - len(_PINNED) <= _MEMO_FILES
+        ):
+            return
+        if fname not in _PINNED:
+            _forget(fname)
+
+
+def _forget(fname):
+    """
+    Drop memoized contents of a file, lock held.
+
+    The contents are not closed, another thread may still be using them; a
+    memory map is released when its last reference goes away
+    """
+    obj = _CONTENTS.pop(fname, None)
+    if obj is not None:
+        if fname in _PINNED:
+            _PINNED.discard(fname)
+        else:
+            _MEMO["bytes"] -= obj.size
+
+
+def _load(fname):
+    """Read or memory-map a file, return None if it cannot be read."""
+    try:
+        with open(fname, "rb") as fobj:
+            size = os.fstat(fobj.fileno()).st_size
+            timings.count("files_read")
+            timings.count("bytes_read", size)
+            if size < _MMAP_SIZE:
+                return FileContent(fname, fobj.read())
+            import mmap
+
+            return FileContent(
+                fname, mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+            )
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def clear():
+    """Forget all memoized file contents and existence checks."""
+    with _LOCK:
+        for fname in list(_CONTENTS):
+            _forget(fname)
+        _EXISTS.clear()
+
+
+def exists(fname):
+    """Return whether a file exists, checking the file system once per file."""
+    fname = os.path.abspath(fname)
+    ret = _EXISTS.get(fname)
+    if ret is None:
+        ret = (fname in _CONTENTS) or os.path.exists(fname)
+        _EXISTS[fname] = ret
+    return ret
+
+
+def forget(fname):
+    """Drop memoized contents of a file, for example after rewriting it."""
+    fname = os.path.abspath(fname)
+    with _LOCK:
+        _forget(fname)
+        _EXISTS.pop(fname, None)
+
+
+def get(fname):
+    """
+    Return contents of a file, None if the file cannot be read.
+
+    The file is read (or memory-mapped, if big) once and its contents
+    memoized, subsequent calls return the same object
+    """
+    fname = os.path.abspath(fname)
+    with _LOCK:
+        obj = _CONTENTS.pop(fname, None)
+        if obj is not None:
+            _CONTENTS[fname] = obj
+            return obj
+    obj = _load(fname)
+    with _LOCK:
+        if fname in _CONTENTS:
+            # Loaded by another thread in the meantime
+            if obj is not None:
+                obj.close()
+            return _CONTENTS[fname]
+        _EXISTS[fname] = (obj is not None) or os.path.exists(fname)
+        if obj is not None:
+            _CONTENTS[fname] = obj
+            _MEMO["bytes"] += obj.size
+            _evict()
+    return obj
+
+
+def is_binary(fname):
+    """Return whether a file is binary, that is, it has a NUL byte near the start."""
+    obj = get(fname)
+    return (obj is not None) and obj.is_binary()
+
+
+def is_loaded(fname):
+    """Return whether the contents of a file are memoized."""
+    return os.path.abspath(fname) in _CONTENTS
+
+
+def open_file(fname):
+    """Return binary stream of a file, in memory if its contents are memoized."""
+    obj = _CONTENTS.get(os.path.abspath(fname))
+    return open(fname, "rb") if obj is None else obj.stream()
+
+
+def pin(fname, data):
+    """
+    Memoize contents of a file given as bytes, for example read from Git.
+
+    Pinned contents are kept like preloaded ones, and returned instead of the
+    file contents until forgotten or cleared
+    """
+    fname = os.path.abspath(fname)
+    with _LOCK:
+        _forget(fname)
+        _CONTENTS[fname] = FileContent(fname, data)
+        _PINNED.add(fname)
+        _EXISTS[fname] = True
+
+
+def preload(fnames):
+    """
+    Read and memoize contents of files, return the ones that could be read.
+
+    Preloaded files are kept until forgotten or cleared, regardless of the
+    memo size limits
+    """
+    ret = []
+    for fname in fnames:
+        obj = get(fname)
+        if obj is None:
+            continue
+        key = os.path.abspath(fname)
+        with _LOCK:
+            if (_CONTENTS.get(key) is obj) and (key not in _PINNED):
+                _PINNED.add(key)
+                _MEMO["bytes"] -= obj.size
+        ret.append(fname)
+    return ret
+
+
+def read_bytes(fname):
+    """Return file contents as bytes, None if the file cannot be read."""
+    obj = get(fname)
+    return None if obj is None else obj.tobytes()
+
+
+def read_lines(fname, encoding="utf-8"):
+    """Return decoded file lines without line terminators, empty if unreadable."""
+    obj = get(fname)
+    return [] if obj is None else obj.lines(encoding)
+
+
+def tostr(obj, encoding="utf-8"):  # pragma: no cover
+    """Convert to string if necessary."""
+    if isinstance(obj, str):
+        return obj
+    return obj.decode(encoding, "replace") if IS_PY3 else obj.encode(encoding)
+
+
+###
+# Classes
+###
+class _MapReader(io.RawIOBase):
+    """Raw stream over a memory map, with its own position."""
+
+    def __init__(self, data):  # noqa
+        super(_MapReader, self).__init__()
+        self._data = data
+        self._pos = 0
+
+    def readable(self):  # noqa
+        return True
+
+    def readinto(self, buf):  # noqa
+        chunk = self._data[self._pos : self._pos + len(buf)]
+        buf[: len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+
+class FileContent(object):
+    """
+    Contents of a file.
+
+    Contents are kept as read, in a bytes object or a read-only memory map.
+    Line boundaries are found the first time they are needed and lines are
+    only sliced and decoded when asked for
+    """
+
+    def __init__(self, fname, data):  # noqa
+        self.fname = fname
+        self.data = data
+        self.size = len(data)
+        self._offsets = None
+
+    def __len__(self):  # noqa
+        return self.size
+
+    def _line_offsets(self):
+        """Return start and end offsets of lines, excluding terminators."""
+        if self._offsets is None:
+            from array import array
+
+            starts, ends = array("L", [0]), array("L")
+            for match in _NEWLINE_REGEXP.finditer(self.data):
+                ends.append(match.start())
+                starts.append(match.end())
+            if starts[-1] == self.size:
+                starts.pop()
+            else:
+                ends.append(self.size)
+            self._offsets = (starts, ends)
+        return self._offsets
+
+    def close(self):
+        """Release memory map, if any."""
+        if not isinstance(self.data, bytes):
+            self.data.close()
+
+    def find(self, sub, start=0):
+        """Return offset of first occurrence of bytes, -1 if not found."""
+        return self.data.find(sub, start)
+
+    def is_binary(self):
+        """Return whether there is a NUL byte near the start of the file."""
+        return self.data.find(b"\x00", 0, _BINARY_PREFIX) != -1
+
+    def line(self, num, encoding=None):
+        """Return a 1-based numbered line without terminator, maybe decoded."""
+        starts, ends = self._line_offsets()
+        line = self.data[starts[num - 1] : ends[num - 1]]
+        return line if encoding is None else tostr(line, encoding)
+
+    def line_count(self):
+        """Return number of lines."""
+        return len(self._line_offsets()[0])
+
+    def line_offset(self, num):
+        """Return byte offset of the start of a line (1-based)."""
+        return self._line_offsets()[0][num - 1]
+
+    def lines(self, encoding="utf-8"):
+        """Return decoded lines without line terminators."""
+        return [tostr(line, encoding) for line in self.raw_lines()]
+
+    def raw_lines(self):
+        """
+        Generate lines as bytes, without line terminators.
+
+        Line boundaries are found as lines are generated if they are not known
+        yet, without keeping them
+        """
+        if self._offsets is not None:
+            starts, ends = self._offsets
+            for start, end in zip(starts, ends):
+                yield self.data[start:end]
+            return
+        start = 0
+        for match in _NEWLINE_REGEXP.finditer(self.data):
+            yield self.data[start : match.start()]
+            start = match.end()
+        if start < self.size:
+            yield self.data[start:]
+
+    def stream(self):
+        """Return binary stream of the contents, with its own position."""
+        if isinstance(self.data, bytes):
+            return io.BytesIO(self.data)
+        return io.BufferedReader(_MapReader(self.data))
+
+    def tobytes(self):
+        """Return contents as a bytes object."""
+        return self.data if isinstance(self.data, bytes) else self.data[:]
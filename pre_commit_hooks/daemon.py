@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+# daemon.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,C0415,R0205,W0212,W0406,W0703
+
+# Standard library imports
+from __future__ import print_function
+import argparse
+import json
+import os
+import sys
+import time
+
+# Intra-package imports
+from pre_commit_hooks import client, content
+
+###
+# Global variables
+###
+# Seconds the daemon waits for a request before shutting down, and seconds
+# it waits for a request to arrive
+_IDLE_TIMEOUT = 600
+_READ_TIMEOUT = 30
+# Whether this process is the daemon
+_STATE = {"serving": False}
+# Modification stamps of .headerrc files whose templates the daemon keeps
+_STAMPS = {}
+
+
+###
+# Functions
+###
+def _exit_code(code):
+    """Return exit code of a SystemExit exception, as sys.exit would."""
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _handle(data, stamp):
+    """Return reply to a request, and whether the daemon should stop."""
+    try:
+        payload = json.loads(data.decode("utf-8"))
+    except ValueError:
+        return {"error": "Invalid request"}, False
+    command = payload.get("command")
+    if command == "status":
+        return {"pid": os.getpid()}, False
+    if command == "stop":
+        return {"pid": os.getpid()}, True
+    if command != "run":
+        return {"error": "Unknown command {0}".format(command)}, False
+    if payload.get("stamp") != stamp:
+        # The package or interpreter changed since the daemon was started,
+        # the client runs the hook itself and a new daemon can be started
+        return {"error": "Daemon is out of date"}, True
+    if payload.get("hook") not in client.HOOKS:
+        return {"error": "Unknown hook {0}".format(payload.get("hook"))}, False
+    return _run(payload), False
+
+
+def _header_memos():
+    """Return compiled header template memos, if the header hook was run."""
+    header = sys.modules.get("pre_commit_hooks.header")
+    if header is None:
+        return None, []
+    return header, [header._HEADER_REGEXPS, header._HEADER_TEXTS]
+
+
+def _invalidate():
+    """Forget what files may have changed since the previous run."""
+    content.clear()
+    header, memos = _header_memos()
+    if header is None:
+        return
+    # Header templates are kept unless their .headerrc file changed
+    header._HEADER_REFS.clear()
+    for memo in memos:
+        for key in list(memo):
+            if (key[0] not in _STAMPS) or (_stat(key[0]) != _STAMPS[key[0]]):
+                del memo[key]
+    _STAMPS.clear()
+
+
+def _record():
+    """Record modification stamps of .headerrc files with kept templates."""
+    for memo in _header_memos()[1]:
+        for key in memo:
+            if key[0] not in _STAMPS:
+                _STAMPS[key[0]] = _stat(key[0])
+
+
+def _run(payload):
+    """Run a hook in the client directory and environment, capturing output."""
+    # Modules only the daemon itself needs are imported when used, so that
+    # hook clients do not pay for them
+    import importlib
+    import traceback
+
+    module, func = client.HOOKS[payload["hook"]]
+    cwd, environ, sys_argv = os.getcwd(), dict(os.environ), sys.argv
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = _Capture(), _Capture()
+    # Usage messages show the client program name
+    sys.argv = [payload.get("prog", "")] + payload["argv"]
+    retval = 1
+    try:
+        os.chdir(payload["cwd"])
+        # Variables hooks do not read keep the daemon values
+        for name in [name for name in os.environ if client._relevant(name)]:
+            del os.environ[name]
+        os.environ.update(payload["env"])
+        _invalidate()
+        hook = getattr(importlib.import_module("pre_commit_hooks." + module), func)
+        retval = hook(payload["argv"]) or 0
+    except SystemExit as error:
+        retval = _exit_code(error.code)
+    except Exception:
+        traceback.print_exc()
+    finally:
+        reply = {
+            "stdout": sys.stdout.getvalue(),
+            "stderr": sys.stderr.getvalue(),
+            "retval": retval,
+        }
+        sys.stdout, sys.stderr = stdout, stderr
+        sys.argv = sys_argv
+        _record()
+        content.clear()
+        os.environ.clear()
+        os.environ.update(environ)
+        os.chdir(cwd)
+    return reply
+
+
+def _shutdown():
+    """Terminate Hunspell sessions kept between runs."""
+    spelling = sys.modules.get("pre_commit_hooks.spelling")
+    if spelling is not None:
+        for _, pool in spelling._POOLS.values():
+            pool.close()
+        spelling._POOLS.clear()
+
+
+def _start(path, idle_timeout):
+    """Start daemon in the background, return whether it is serving."""
+    import subprocess
+
+    devnull = open(os.devnull, "r+b")
+    kwargs = {"stdin": devnull, "stdout": devnull, "stderr": devnull}
+    if hasattr(os, "setsid"):
+        kwargs["preexec_fn"] = os.setsid
+    cmd = [sys.executable, "-m", "pre_commit_hooks.daemon", "serve"]
+    try:
+        subprocess.Popen(
+            cmd + ["--idle-timeout", str(idle_timeout)], close_fds=True, **kwargs
+        )
+    finally:
+        devnull.close()
+    start = time.time()
+    while time.time() - start < 10:
+        if os.path.exists(path) and (client.request({"command": "status"}) is not None):
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def _stat(fname):
+    """Return modification time and size of a file, None if it does not exist."""
+    try:
+        fstat = os.stat(fname)
+    except (IOError, OSError):
+        return None
+    return [fstat.st_mtime, fstat.st_size]
+
+
+def serve(path, idle_timeout=_IDLE_TIMEOUT):
+    """
+    Serve hook runs on a Unix socket until stopped or idle for too long.
+
+    Requests are served one at a time. Interpreter start-up and imports,
+    Hunspell sessions, compiled header templates and result caches are kept
+    between runs; file contents are read anew on every run
+    """
+    import importlib
+    import socket
+
+    if client.request({"command": "status"}) is not None:
+        print("Daemon already running", file=sys.stderr)
+        return 1
+    sock_dir = os.path.dirname(path)
+    if not os.path.isdir(sock_dir):
+        os.makedirs(sock_dir)
+    if os.path.exists(path):
+        # Left behind by a daemon that did not shut down cleanly
+        os.remove(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o177)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(umask)
+    server.listen(16)
+    server.settimeout(idle_timeout or None)
+    _STATE["serving"] = True
+    stamp = client._code_stamp()
+    for module, _ in client.HOOKS.values():
+        try:
+            importlib.import_module("pre_commit_hooks." + module)
+        except ImportError:
+            pass
+    try:
+        stop = False
+        while not stop:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                break
+            try:
+                conn.settimeout(_READ_TIMEOUT)
+                reply, stop = _handle(client._read_line(conn), stamp)
+                conn.sendall(json.dumps(reply).encode("utf-8") + b"\n")
+            except (IOError, OSError, socket.error):
+                pass
+            finally:
+                conn.close()
+    finally:
+        _STATE["serving"] = False
+        server.close()
+        if os.path.exists(path):
+            os.remove(path)
+        _shutdown()
+    return 0
+
+
+def serving():
+    """Return whether this process is the daemon."""
+    return _STATE["serving"]
+
+
+def main(argv=None):
+    """Script entry point."""
+    import socket
+
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(
+        description="Checker daemon of the repository in the current directory"
+    )
+    parser.add_argument("command", choices=["serve", "start", "status", "stop"])
+    parser.add_argument("--idle-timeout", nargs=1, type=int, default=[_IDLE_TIMEOUT])
+    cli_args = parser.parse_args(argv)
+    ###
+    path = client.socket_path()
+    if not hasattr(socket, "AF_UNIX"):
+        print("Unix sockets are not supported on this platform", file=sys.stderr)
+        return 1
+    if not path:
+        print("Not in a Git repository", file=sys.stderr)
+        return 1
+    if cli_args.command == "serve":
+        return serve(path, cli_args.idle_timeout[0])
+    reply = client.request({"command": "status"})
+    if cli_args.command == "start":
+        if reply is None and (not _start(path, cli_args.idle_timeout[0])):
+            print("Daemon could not be started", file=sys.stderr)
+            return 1
+        reply = client.request({"command": "status"}) if reply is None else reply
+        print("Daemon running (pid {0})".format(reply["pid"]))
+        return 0
+    if reply is None:
+        print("Daemon not running")
+        return 1 if cli_args.command == "status" else 0
+    if cli_args.command == "stop":
+        client.request({"command": "stop"})
+        print("Daemon stopped (pid {0})".format(reply["pid"]))
+    else:
+        print("Daemon running (pid {0})".format(reply["pid"]))
+    return 0
+
+
+###
+# Classes
+###
+class _Capture(object):
+    """Text stream that keeps what is written to it."""
+
+    def __init__(self):  # noqa
+        self._chunks = []
+
+    def flush(self):  # noqa
+        pass
+
+    def getvalue(self):
+        """Return text written so far."""
+        return "".join(self._chunks)
+
+    def isatty(self):  # noqa
+        return False
+
+    def write(self, text):
+        """Keep text."""
+        self._chunks.append(content.tostr(text))
+
+
+if __name__ == "__main__":
+    # Hooks look at the state of the package module, not of this one
+    from pre_commit_hooks import daemon
+
+    sys.exit(daemon.main(sys.argv[1:]))
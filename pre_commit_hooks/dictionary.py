@@ -0,0 +1,374 @@
+# dictionary.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,R0205,R0902,R0912
+
+# Standard library imports
+import codecs
+import os
+import re
+
+# Intra-package imports
+from pre_commit_hooks import content
+from pre_commit_hooks.whitelist import WhitelistIndex, _read_whitelist, write_index
+
+###
+# Global variables
+###
+# Version of the compiled dictionary format, part of the index fingerprint
+INDEX_VERSION = "1"
+# Markers of word forms that keep their case or are forbidden, stored in the
+# index as the marker followed by the word (forms that keep their case are
+# stored without the marker too)
+_KEEPCASE = u"\x01"
+_FORBIDDEN = u"\x02"
+# Numbers, with optional separators, are always correct
+_NUMBER_REGEXP = re.compile(r"^[0-9]+(?:[.,\-][0-9]+)*\.?$")
+# White space-separated text Hunspell does not check
+_URL_REGEXP = re.compile(r"^(?:\w+://|www\.)|^[^@\s]+@[^@\s]+\.\w+$")
+_APOSTROPHES = u"'\u2019"
+
+
+###
+# Functions
+###
+def _condition_regexp(cond, suffix):
+    """Return compiled regular expression of an affix rule condition."""
+    if cond == ".":
+        return None
+    parts, num = [], 0
+    while num < len(cond):
+        if cond[num] == "[":
+            end = cond.find("]", num + 1)
+            end = len(cond) - 1 if end == -1 else end
+            body = cond[num + 1 : end]
+            negated = body.startswith("^")
+            body = re.escape(body[1:] if negated else body)
+            parts.append("[{0}{1}]".format("^" if negated else "", body))
+            num = end + 1
+        else:
+            parts.append("." if cond[num] == "." else re.escape(cond[num]))
+            num += 1
+    pattern = "".join(parts)
+    return re.compile(pattern + "$" if suffix else "^" + pattern, re.UNICODE)
+
+
+def _encoding(fname):
+    """Return Python codec name of the SET encoding of an affix file."""
+    obj = content.get(fname)
+    name = "ISO8859-1"
+    if obj is not None:
+        match = re.search(br"^SET\s+(\S+)", obj.tobytes(), re.MULTILINE)
+        name = match.group(1).decode("ascii", "replace") if match else name
+    name = name.lower().replace("microsoft-", "")
+    try:
+        codecs.lookup(name)
+    except LookupError:
+        name = "iso8859-1"
+    return name
+
+
+def _expand(aff, dic_fname):
+    """Generate word forms of a dictionary file, with their markers."""
+    lines = content.read_lines(dic_fname, aff.encoding)
+    for line in lines[1:]:
+        word, flags = _split_entry(line, aff)
+        if (not word) or (aff.onlyincompound in flags):
+            continue
+        forbidden, keepcase = aff.forbidden in flags, aff.keepcase in flags
+        for form in aff.forms(word, flags):
+            if forbidden:
+                yield _FORBIDDEN + form
+                continue
+            if keepcase:
+                yield _KEEPCASE + form
+            yield form
+
+
+def _split_entry(line, aff):
+    """Return word and flags of a dictionary file line."""
+    entry = line.split("\t")[0].strip()
+    # Morphological fields follow the word after a space
+    entry = re.split(r"\s+(?=\S+:)", entry)[0] if ":" in entry else entry
+    pos = 0
+    while True:
+        pos = entry.find("/", pos + 1)
+        if (pos == -1) or (entry[pos - 1] != "\\"):
+            break
+    if pos == -1:
+        word, flags = entry, set()
+    else:
+        word, flags = entry[:pos], set(aff.flags(entry[pos + 1 :]))
+    word = word.replace("\\/", "/")
+    for char in aff.ignore:
+        word = word.replace(char, "")
+    return word, flags
+
+
+def compile_index(pairs, fname):
+    """Write index of the word forms of (affix file, dictionary file) pairs."""
+    words = set()
+    for aff_fname, dic_fname in pairs:
+        words.update(_expand(Affixes(aff_fname), dic_fname))
+    write_index(fname, words)
+
+
+def load_speller(pairs, personal=None, index_fname=None):
+    """
+    Return speller of (affix file, dictionary file) pairs.
+
+    Word forms are read from the index file, which is compiled first if it
+    does not exist, or expanded in memory if no index file is given. Words of
+    the personal dictionary are also correct
+    """
+    if index_fname is None:
+        words = set()
+        for aff_fname, dic_fname in pairs:
+            words.update(_expand(Affixes(aff_fname), dic_fname))
+    else:
+        if not os.path.exists(index_fname):
+            compile_index(pairs, index_fname)
+        words = WhitelistIndex(index_fname)
+    personal_words = _read_whitelist(personal)[2] if personal else []
+    return Speller(Affixes(pairs[0][0]), words, personal_words)
+
+
+###
+# Classes
+###
+class AffixRule(object):
+    """Prefix or suffix rule of an affix file."""
+
+    def __init__(self, suffix, strip, append, cond, cont, cross):  # noqa
+        self.suffix = suffix
+        self.strip = "" if strip == "0" else strip
+        self.append = "" if append == "0" else append
+        self.cont = cont
+        self.cross = cross
+        self._cond = _condition_regexp(cond, suffix)
+
+    def apply(self, word):
+        """Return word with the affix, None if the rule does not apply to it."""
+        if len(word) <= len(self.strip):
+            return None
+        if self.suffix:
+            if (not word.endswith(self.strip)) or (
+                self._cond and not self._cond.search(word)
+            ):
+                return None
+            return word[: len(word) - len(self.strip)] + self.append
+        if (not word.startswith(self.strip)) or (
+            self._cond and not self._cond.search(word)
+        ):
+            return None
+        return self.append + word[len(self.strip) :]
+
+
+class Affixes(object):
+    """
+    Settings and affix rules of a Hunspell affix (.aff) file.
+
+    Prefix and suffix rules with cross products and one level of suffix
+    continuation classes (twofold suffixes) are supported, as are flag
+    aliases, the FLAG types and the NEEDAFFIX, KEEPCASE, FORBIDDENWORD,
+    ONLYINCOMPOUND, WORDCHARS, IGNORE and BREAK options. Compounding,
+    conversion tables and suggestion options are not
+    """
+
+    def __init__(self, fname):  # noqa
+        self.encoding = _encoding(fname)
+        self.aliases = []
+        self.breaks = None
+        self.flag_type = "char"
+        self.forbidden = None
+        self.ignore = ""
+        self.keepcase = None
+        self.needaffix = None
+        self.onlyincompound = None
+        self.prefixes = {}
+        self.suffixes = {}
+        self.wordchars = ""
+        rules = []
+        for line in content.read_lines(fname, self.encoding):
+            fields = line.split()
+            if (not fields) or fields[0].startswith("#"):
+                continue
+            key, args = fields[0], fields[1:]
+            if (key in ("PFX", "SFX")) and (len(args) >= 3):
+                # Header lines have three fields, rule lines at least four
+                rules.append((key == "SFX", args))
+            elif (key == "FLAG") and args:
+                self.flag_type = args[0]
+            elif (key == "AF") and args and (not args[0].isdigit()):
+                self.aliases.append(args[0])
+            elif (key == "BREAK") and args and (not args[0].isdigit()):
+                self.breaks = (self.breaks or []) + [args[0]]
+            elif (key == "IGNORE") and args:
+                self.ignore = args[0]
+            elif (key == "WORDCHARS") and args:
+                self.wordchars = args[0]
+            elif args and (
+                key in ("FORBIDDENWORD", "KEEPCASE", "NEEDAFFIX", "ONLYINCOMPOUND")
+            ):
+                setattr(self, key.lower().replace("word", ""), args[0])
+        if self.breaks is None:
+            self.breaks = ["-", "^-", "-$"]
+        for attr in ("forbidden", "keepcase", "needaffix", "onlyincompound"):
+            value = getattr(self, attr)
+            setattr(self, attr, self.flags(value)[0] if value else None)
+        self._add_rules(rules)
+
+    def _add_rules(self, rules):
+        """Add prefix and suffix rules, given as affix file fields."""
+        cross = {}
+        for suffix, args in rules:
+            flag = self.flags(args[0], False)[0]
+            if len(args) == 3:
+                # Header line: flag, cross product and number of rules
+                cross[(suffix, flag)] = args[1] == "Y"
+                continue
+            append, _, cont = args[2].partition("/")
+            for char in self.ignore:
+                append = append.replace(char, "")
+            rule = AffixRule(
+                suffix,
+                args[1],
+                append,
+                args[3],
+                set(self.flags(cont)) if cont else set(),
+                cross.get((suffix, flag), False),
+            )
+            (self.suffixes if suffix else self.prefixes).setdefault(flag, []).append(
+                rule
+            )
+
+    def flags(self, text, aliases=True):
+        """Return flags of a flag field, resolving flag aliases."""
+        if aliases and self.aliases and text.isdigit():
+            num = int(text)
+            text = self.aliases[num - 1] if 0 < num <= len(self.aliases) else ""
+        if self.flag_type == "long":
+            return [text[num : num + 2] for num in range(0, len(text), 2)]
+        if self.flag_type == "num":
+            return [item.strip() for item in text.split(",") if item.strip()]
+        return list(text)
+
+    def forms(self, word, flags):
+        """Generate word forms of a dictionary word with its flags."""
+        if self.needaffix not in flags:
+            yield word
+        suffixed = []
+        for flag in flags:
+            for rule in self.suffixes.get(flag, []):
+                form = rule.apply(word)
+                if form is None:
+                    continue
+                if self.needaffix not in rule.cont:
+                    yield form
+                suffixed.append((form, rule))
+                for cflag in rule.cont:
+                    for crule in self.suffixes.get(cflag, []):
+                        cform = crule.apply(form)
+                        if cform is not None:
+                            yield cform
+        for flag in flags:
+            for rule in self.prefixes.get(flag, []):
+                form = rule.apply(word)
+                if form is not None:
+                    yield form
+                if not rule.cross:
+                    continue
+                for sform, srule in suffixed:
+                    form = rule.apply(sform) if srule.cross else None
+                    if form is not None:
+                        yield form
+
+
+class Speller(object):
+    """
+    In-process spell checker of a dictionary, an alternative to Hunspell.
+
+    Words are looked up in the word forms of the dictionary with the Hunspell
+    capitalization rules: capitalized and upper case words are correct if
+    their lower case (or capitalized) form is, unless it keeps its case
+    """
+
+    def __init__(self, aff, words, personal=()):  # noqa
+        self._aff = aff
+        self._words = words
+        self._personal = set(personal)
+        chars = "".join(
+            re.escape(char) for char in aff.wordchars if char not in _APOSTROPHES
+        )
+        letter = r"(?:[^\W\d_]{0})".format("|[" + chars + "]" if chars else "")
+        self._regexp = re.compile(
+            r"{0}+(?:[{1}]{0}+)*".format(letter, _APOSTROPHES), re.UNICODE
+        )
+
+    def __enter__(self):  # noqa
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):  # noqa
+        self.close()
+        return not exc_type is not None
+
+    def _has(self, word):
+        """Return whether a word form is in the dictionary."""
+        return (word in self._personal) or (word in self._words)
+
+    def _lookup(self, word):
+        """Return whether a word is correct, following capitalization rules."""
+        if (_FORBIDDEN + word) in self._words:
+            return False
+        if self._has(word):
+            return True
+        lower = word.lower()
+        if (not word[0].isupper()) or (lower == word):
+            return False
+        cap = lower[0].upper() + lower[1:]
+        candidates = [lower] if word == cap else []
+        if word.isupper():
+            candidates = [lower, cap]
+        return any(
+            self._has(item) and ((_KEEPCASE + item) not in self._words)
+            for item in candidates
+        )
+
+    def check(self, lines):
+        """Return list of misspelled words of each line, as a session does."""
+        ret = []
+        for line in lines:
+            words = []
+            for text in line.split():
+                if _URL_REGEXP.search(text):
+                    continue
+                for word in self._regexp.findall(text):
+                    if not self.spell(word):
+                        words.append(word)
+            ret.append(words)
+        return ret
+
+    def close(self):
+        """Release dictionary index, if any."""
+        if hasattr(self._words, "close"):
+            self._words.close()
+
+    def spell(self, word):
+        """Return whether a word is correct."""
+        word = word.replace(u"\u2019", "'")
+        for char in self._aff.ignore:
+            word = word.replace(char, "")
+        # Numbers are correct, and compounds are not supported, so words with
+        # digits are taken as correct too
+        if (not word) or _NUMBER_REGEXP.match(word) or re.search("[0-9]", word):
+            return True
+        if self._lookup(word):
+            return True
+        for brk in self._aff.breaks:
+            if brk.startswith("^") and word.startswith(brk[1:]) and brk[1:]:
+                return self.spell(word[len(brk) - 1 :])
+            if brk.endswith("$") and word.endswith(brk[:-1]) and brk[:-1]:
+                return self.spell(word[: len(word) - len(brk) + 1])
+            if (brk not in ("^", "$")) and (brk in word.strip(brk)):
+                return all(self.spell(part) for part in word.split(brk) if part)
+        return False
@@ -0,0 +1,168 @@
+# exclude.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,R0205
+
+# Standard library imports
+import os
+import re
+
+# Intra-package imports
+from pre_commit_hooks import content
+
+###
+# Global variables
+###
+# Wildcard patterns compiled into one regular expression, a group each; kept
+# under the 100 groups Python 2 allows in a regular expression
+_CHUNK_SIZE = 90
+
+
+###
+# Functions
+###
+def _normpath(fname):
+    """Return absolute path with forward slashes, in the file system case."""
+    fname = os.path.normcase(os.path.abspath(fname))
+    return fname.replace(os.sep, "/") if os.sep != "/" else fname
+
+
+def _translate(pattern):
+    """
+    Translate a wildcard pattern to a regular expression.
+
+    As in fnmatch, * and ? match any characters, path separators included, and
+    [...] matches a character class; **/ matches zero or more directories
+    """
+    ret, num, size = [], 0, len(pattern)
+    while num < size:
+        char = pattern[num]
+        num += 1
+        if pattern[num - 1 : num + 2] == "**/":
+            ret.append("(?:.*/)?")
+            num += 2
+        elif char == "*":
+            while pattern[num : num + 1] == "*":
+                num += 1
+            ret.append(".*")
+        elif char == "?":
+            ret.append(".")
+        elif char == "[":
+            end = num
+            if pattern[end : end + 1] == "!":
+                end += 1
+            if pattern[end : end + 1] == "]":
+                end += 1
+            end = pattern.find("]", end)
+            if end == -1:
+                ret.append("\\[")
+            else:
+                body = pattern[num:end].replace("\\", "\\\\")
+                num = end + 1
+                if body[0] == "!":
+                    body = "^" + body[1:]
+                elif body[0] == "^":
+                    body = "\\" + body
+                ret.append("[" + body + "]")
+        else:
+            ret.append(re.escape(char))
+    return "".join(ret)
+
+
+def read_matcher(fname):
+    """Return matcher of the patterns in an exclude file."""
+    return ExcludeMatcher(content.read_lines(fname))
+
+
+###
+# Classes
+###
+class ExcludeMatcher(object):
+    """
+    Matcher of files against exclude patterns, compiled once.
+
+    Patterns are relative to the current directory unless absolute, one per
+    line. Blank lines and lines starting with # are ignored, a leading !
+    re-includes files excluded by earlier patterns (the last matching pattern
+    wins) and a trailing / only matches directories. A pattern that matches a
+    directory matches every file under it.
+
+    Patterns without wildcards are looked up in a dictionary. The rest are
+    grouped by the directory before their first wildcard and each group is
+    compiled into one regular expression, so a file is only matched against
+    the patterns of its parent directories
+    """
+
+    def __init__(self, patterns, base_dir=None):  # noqa
+        base_dir = base_dir or os.getcwd()
+        self._negated = []
+        # Literal paths matched by the file or a parent directory, and literal
+        # paths only matched by a parent directory, with their pattern index
+        self._paths = {}
+        self._dirs = {}
+        wildcards = {}
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if (not pattern) or pattern.startswith("#"):
+                continue
+            negated = pattern.startswith("!")
+            pattern = pattern[1:] if negated else pattern
+            if pattern[:2] in ("\\!", "\\#"):
+                pattern = pattern[1:]
+            dir_only = pattern.endswith("/")
+            index = len(self._negated)
+            self._negated.append(negated)
+            fname = _normpath(os.path.join(base_dir, pattern))
+            if not any(char in pattern for char in "*?["):
+                (self._dirs if dir_only else self._paths)[fname] = index
+                continue
+            suffix = "/.*" if dir_only else "(?:/.*)?"
+            prefix = re.split(r"[*?[]", fname, 1)[0]
+            wildcards.setdefault(prefix[: prefix.rfind("/")], []).append(
+                (index, _translate(fname) + suffix)
+            )
+        self._regexps = {}
+        for sdir, items in wildcards.items():
+            # Later patterns come first, so that the first alternative that
+            # matches is the last matching pattern
+            items.reverse()
+            self._regexps[sdir] = [
+                (
+                    re.compile(
+                        "(?:"
+                        + "|".join("({0})".format(item[1]) for item in chunk)
+                        + r")\Z",
+                        re.DOTALL,
+                    ),
+                    [item[0] for item in chunk],
+                )
+                for chunk in (
+                    items[start : start + _CHUNK_SIZE]
+                    for start in range(0, len(items), _CHUNK_SIZE)
+                )
+            ]
+
+    def __len__(self):  # noqa
+        return len(self._negated)
+
+    def excluded(self, fname):
+        """Return whether a file is excluded."""
+        path = _normpath(fname)
+        index = self._paths.get(path, -1)
+        pos = path.rfind("/")
+        while pos >= 0:
+            parent = path[:pos]
+            index = max(index, self._paths.get(parent, -1), self._dirs.get(parent, -1))
+            for regexp, indexes in self._regexps.get(parent, []):
+                match = regexp.match(path)
+                if match:
+                    index = max(index, indexes[match.lastindex - 1])
+                    break
+            pos = path.rfind("/", 0, pos)
+        return (index != -1) and (not self._negated[index])
+
+    def filter(self, fnames):
+        """Return files that are not excluded, in the same order."""
+        if not self._negated:
+            return list(fnames)
+        return [fname for fname in fnames if not self.excluded(fname)]
@@ -2,26 +2,63 @@
 # header.py
 # Copyright (c) 2019 Pablo Acosta-Serafini
 # See LICENSE for details
-# pylint: disable=C0103,C0111,R0912,R0914
+# pylint: disable=C0103,C0111,C0415,R0912,R0914
 
 # Standard library imports
 from __future__ import print_function
 import argparse
+import codecs
 import datetime
-from fnmatch import fnmatch
+import itertools
 import os
 import re
 import sys
 
+# Intra-package imports
+from pre_commit_hooks import content, timings
+from pre_commit_hooks.compat import cpu_count
+from pre_commit_hooks.exclude import read_matcher
+
 ###
 # Global variables
 ###
 IS_PY3 = sys.hexversion > 0x03000000
+# Per-run caches of .headerrc file by directory and of compiled header
+# templates and compliant header texts by (.headerrc file, comment, current
+# year)
+_HEADER_REFS = {}
+_HEADER_REGEXPS = {}
+_HEADER_TEXTS = {}
+# Size of the file prefix read at a time, and maximum line length
+_PREFIX_SIZE = 8192
 
 
 ###
 # Functions (common with plugin)
 ###
+def _byte_lines(fobj, buf=b""):
+    """Return lines of a binary stream, truncating over-long lines."""
+    skip = False
+    while True:
+        pos = buf.find(b"\n")
+        if (pos == -1) and (len(buf) < _PREFIX_SIZE):
+            data = fobj.read(_PREFIX_SIZE)
+            if data:
+                buf += data
+                continue
+        if pos == -1:
+            # End of file or over-long line, the rest of which is discarded
+            if buf and (not skip):
+                yield buf[:_PREFIX_SIZE]
+            if len(buf) < _PREFIX_SIZE:
+                return
+            buf, skip = b"", True
+            continue
+        if not skip:
+            yield buf[: pos + 1]
+        buf, skip = buf[pos + 1 :], False
+
+
 def _check_header(fname, streamer, comment="#", header_ref=""):
     """Check that all files have header line and copyright notice."""
     # pylint: disable=W0702
@@ -32,23 +69,19 @@ def _check_header(fname, streamer, comment="#", header_ref=""):
             file=sys.stderr,
         )
         return []
-    fullname = os.path.basename(os.path.abspath(fname))
     basename = os.path.basename(os.path.abspath(fname))
-    current_year = datetime.datetime.now().year
-    header_lines = []
-    for line in _read_file(header_ref):
-        line = line.format(
-            comment=comment,
-            fullname=fullname,
-            basename=basename,
-            current_year=current_year,
-        )
-        header_lines.append(re.compile("^" + line + "$"))
-    linenos = []
+    header_lines = _header_regexps(header_ref, comment)
     with streamer(fname) as stream:
-        for (num, line), regexp in zip(_content_lines(stream, comment), header_lines):
-            if not regexp.match(line):
-                linenos.append(num)
+        return _check_lines(stream, comment, header_lines, basename)
+
+
+def _check_lines(lines, comment, header_lines, basename):
+    """Return numbers of lines that do not match header template."""
+    linenos = []
+    # Header lines go first so that no content line is read past the header
+    for regexp, (num, line) in zip(header_lines, _content_lines(lines, comment)):
+        if not _match(regexp, line, basename):
+            linenos.append(num)
     return linenos
 
 
@@ -58,24 +91,28 @@ def _content_lines(stream, comment="#"):
     sl_mod_docstring = re.compile("('''|\"\"\").*('''|\"\"\")")
     encoding_dribble = "\xef\xbb\xbf"
     shebang_line = False
+    # Module docstring follows the shebang and encoding lines, if any
+    doc_num = 0
     in_mod_docstring = False
     mod_string_done = False
     cregexp = re.compile(r"^{0} -\*- coding: utf-8 -\*-\s*".format(comment))
     for num, line in enumerate(stream):
-        line = _tostr(line).rstrip()
+        line = content.tostr(line).rstrip()
         if (not num) and line.startswith(encoding_dribble):
             line = line[len(encoding_dribble) :]
         # Skip shebang line
         if (not num) and shebang_line_regexp.match(line):
             shebang_line = True
+            doc_num = 1
             continue
         # Skip file encoding line
         if (num == int(shebang_line)) and cregexp.match(line):
+            doc_num = num + 1
             continue
         # Skip single-line module docstring
-        if (not num) and sl_mod_docstring.match(line):
+        if (num == doc_num) and sl_mod_docstring.match(line):
             continue
-        if (not num) and (not mod_string_done) and line.startswith('"""'):
+        if (num == doc_num) and (not mod_string_done) and line.startswith('"""'):
             in_mod_docstring = True
             continue
         if in_mod_docstring and line.endswith('"""'):
@@ -87,42 +124,97 @@ def _content_lines(stream, comment="#"):
         yield num + 1, line
 
 
+def _declared_encoding(data):
+    """Return encoding declared in the first two lines (PEP 263), UTF-8 if none."""
+    regexp = re.compile(br"^[ \t\f]*#.*?coding[:=][ \t]*([-\w.]+)")
+    for line in data.split(b"\n")[:2]:
+        match = regexp.match(line)
+        if match:
+            try:
+                return codecs.lookup(match.group(1).decode("ascii")).name
+            except LookupError:
+                break
+    return "utf-8"
+
+
 def _find_header_ref(fname):
     """Find .headerrc file."""
+    visited = []
+    rcfile = ""
     curr_dir = ""
     next_dir = os.path.dirname(os.path.abspath(fname))
     while next_dir != curr_dir:
         curr_dir = next_dir
-        rcfile = os.path.join(curr_dir, ".headerrc")
-        if os.path.exists(rcfile):
-            return rcfile
+        if curr_dir in _HEADER_REFS:
+            rcfile = _HEADER_REFS[curr_dir]
+            break
+        visited.append(curr_dir)
+        if os.path.exists(os.path.join(curr_dir, ".headerrc")):
+            rcfile = os.path.join(curr_dir, ".headerrc")
+            break
         next_dir = os.path.dirname(curr_dir)
-    return ""
+    for sdir in visited:
+        _HEADER_REFS[sdir] = rcfile
+    return rcfile
+
 
+def _header_regexps(header_ref, comment="#"):
+    """
+    Return compiled header template lines.
 
-def _read_file(fname):
-    """Return file lines as strings."""
-    with open(fname) as fobj:
-        for line in fobj:
-            yield _tostr(line).strip()
+    The file name fields are compiled as a named group (and back-references
+    to it for repeated fields) that the caller checks against the file name,
+    so that the template is compiled once for all files
+    """
+    current_year = datetime.datetime.now().year
+    key = (header_ref, comment, current_year)
+    if key not in _HEADER_REGEXPS:
+        marker = "\x00"
+        header_lines = []
+        for line in content.read_lines(header_ref):
+            line = line.strip().format(
+                comment=comment,
+                fullname=marker,
+                basename=marker,
+                current_year=current_year,
+            )
+            line = line.replace(marker, "(?P<basename>.+?)", 1)
+            line = line.replace(marker, "(?P=basename)")
+            header_lines.append(re.compile("^" + line + "$"))
+        _HEADER_REGEXPS[key] = header_lines
+    return _HEADER_REGEXPS[key]
 
 
-def _tostr(obj):  # pragma: no cover
-    """Convert to string if necessary."""
-    return obj if isinstance(obj, str) else (obj.decode() if IS_PY3 else obj.encode())
+def _match(regexp, line, basename):
+    """Check that a line matches a header template line."""
+    match = regexp.match(line)
+    return bool(match) and (match.groupdict().get("basename") in [None, basename])
 
 
 class StreamFile(object):
     # pylint: disable=R0903
-    """Stream class."""
+    """
+    Stream class.
+
+    The file is read lazily in bounded binary chunks, so only the prefix the
+    header check needs is read. The UTF-8 byte order mark is dropped, lines
+    are decoded with the encoding the file declares and binary files (a NUL
+    byte in the first chunk) produce no lines
+    """
 
     def __init__(self, lint_file):  # noqa
         self.fname = lint_file
 
     def __enter__(self):  # noqa
-        with open(self.fname, "r") as fobj:
-            for line in fobj:
-                yield line
+        with content.open_file(self.fname) as fobj:
+            data = fobj.read(_PREFIX_SIZE)
+            if b"\x00" in data:
+                return
+            if data.startswith(codecs.BOM_UTF8):
+                data = data[len(codecs.BOM_UTF8) :]
+            encoding = _declared_encoding(data)
+            for line in _byte_lines(fobj, data):
+                yield line.decode(encoding, "replace") if IS_PY3 else line
 
     def __exit__(self, exc_type, exc_value, exc_tb):  # noqa
         return not exc_type is not None
@@ -131,6 +223,178 @@ class StreamFile(object):
 ###
 # Hook-specific functions
 ###
+def _expand_regexp(pattern):
+    """
+    Return all strings a regular expression matches.
+
+    Only literal and escaped characters and (possibly nested) groups with
+    alternatives are supported, ValueError is raised otherwise
+    """
+
+    def alternation(pos):
+        texts, pos = sequence(pos)
+        while (pos < len(pattern)) and (pattern[pos] == "|"):
+            items, pos = sequence(pos + 1)
+            texts += items
+        return texts, pos
+
+    def sequence(pos):
+        texts = [""]
+        while (pos < len(pattern)) and (pattern[pos] not in "|)"):
+            char = pattern[pos]
+            if char == "(":
+                pos += 1
+                if pattern.startswith("?:", pos):
+                    pos += 2
+                elif pattern.startswith("?P<", pos):
+                    pos = pattern.index(">", pos) + 1
+                items, pos = alternation(pos)
+                if (pos >= len(pattern)) or (pattern[pos] != ")"):
+                    raise ValueError("Unbalanced parenthesis in " + pattern)
+                pos += 1
+            elif char == "\\":
+                if (pos + 1 >= len(pattern)) or pattern[pos + 1].isalnum():
+                    raise ValueError("Unsupported escape sequence in " + pattern)
+                items, pos = [pattern[pos + 1]], pos + 2
+            elif char in ".^$*+?{}[]":
+                raise ValueError(
+                    "Unsupported construct {0} in {1}".format(char, pattern)
+                )
+            else:
+                items, pos = [char], pos + 1
+            texts = [text + item for text in texts for item in items]
+        return texts, pos
+
+    texts, pos = alternation(0)
+    if pos != len(pattern):
+        raise ValueError("Unbalanced parenthesis in " + pattern)
+    return texts
+
+
+def _fix_file(args):
+    """Fix header of a file, return whether it was fixed."""
+    fname, comment = args
+    try:
+        return _fix_header(fname, comment)
+    except (IOError, OSError, UnicodeError, ValueError):
+        return False
+
+
+def _fix_files(items, jobs):
+    """Fix headers of (file name, comment) items, in parallel batches of files."""
+    batch = 64
+    jobs = min(jobs, (len(items) + batch - 1) // batch)
+    if jobs < 2:
+        return [_fix_file(item) for item in items]
+    import multiprocessing
+
+    pool = multiprocessing.Pool(jobs)
+    try:
+        return pool.map(_fix_file, items, chunksize=batch)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _fix_header(fname, comment="#", header_ref=""):
+    """
+    Rewrite file header to comply with reference template.
+
+    Header lines that match the template are kept, comment lines similar to
+    a header line are replaced and missing lines are inserted right after
+    the shebang, encoding line and module docstring. Returns whether the
+    file was rewritten
+    """
+    # pylint: disable=R0915
+    # Only fixing files needs these, checking them is the fast path
+    import shutil
+    import tempfile
+
+    header_ref = header_ref.strip() or _find_header_ref(fname)
+    if not header_ref:
+        return False
+    data = content.read_bytes(fname)
+    if (data is None) or (b"\x00" in data[:_PREFIX_SIZE]):
+        return False
+    bom = codecs.BOM_UTF8 if data.startswith(codecs.BOM_UTF8) else b""
+    encoding = _declared_encoding(data[len(bom) : len(bom) + _PREFIX_SIZE])
+    errors = "surrogateescape" if IS_PY3 else "strict"
+    lines = data[len(bom) :].decode(encoding, errors).splitlines(True)
+    newline = (lines[0][len(lines[0].rstrip("\r\n")) :] if lines else "") or "\n"
+    basename = os.path.basename(os.path.abspath(fname))
+    regexps = _header_regexps(header_ref, comment)
+    candidates = [
+        [item.replace("\x00", basename) for item in items]
+        for items in _header_texts(header_ref, comment)
+    ]
+    # A shebang line the check does not skip is not moved either, the file is
+    # then not rewritten as it still does not comply
+    skip = int(bool(lines) and lines[0].startswith("#!"))
+    body = [
+        (num + skip, line)
+        for num, line in itertools.islice(
+            _content_lines(lines[skip:], comment), len(regexps)
+        )
+    ]
+    start = body[0][0] - 1 if body else len(lines)
+    header, pos = [], 0
+    for regexp, items in zip(regexps, candidates):
+        if pos < len(body):
+            line = body[pos][1]
+            if _match(regexp, line, basename):
+                header.append(lines[start + pos])
+                pos += 1
+                continue
+            # Prefer the text that keeps most of the line (e.g. the first
+            # year of a copyright range), then the most similar one
+            scores = [_similarity(item, line) for item in items]
+            best = items[scores.index(max(scores))]
+            if line.startswith(comment) and (max(scores)[1] >= 0.6):
+                header.append(best + newline)
+                pos += 1
+                continue
+        header.append(items[0] + newline)
+    if lines and (start == len(lines)) and (not lines[-1].endswith(("\r", "\n"))):
+        lines[-1] += newline
+    new_lines = lines[:start] + header + lines[start + pos :]
+    if (new_lines == lines) or _check_lines(new_lines, comment, regexps, basename):
+        return False
+    fdesc, tmp_fname = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(fname)), suffix=".tmp"
+    )
+    with os.fdopen(fdesc, "wb") as fobj:
+        fobj.write(bom + "".join(new_lines).encode(encoding, errors))
+    shutil.copymode(fname, tmp_fname)
+    # os.replace is not available in Python 2
+    getattr(os, "replace", os.rename)(tmp_fname, fname)
+    content.forget(fname)
+    return True
+
+
+def _header_texts(header_ref, comment="#"):
+    """
+    Return texts that comply with each header template line.
+
+    The file name fields are returned as a NUL character for the caller to
+    replace
+    """
+    current_year = datetime.datetime.now().year
+    key = (header_ref, comment, current_year)
+    if key not in _HEADER_TEXTS:
+        header_texts = []
+        for line in content.read_lines(header_ref):
+            line = line.strip().format(
+                comment="\x01",
+                fullname="\x00",
+                basename="\x00",
+                current_year=current_year,
+            )
+            texts = _expand_regexp(line)
+            header_texts.append([text.replace("\x01", comment) for text in texts])
+        _HEADER_TEXTS[key] = header_texts
+    return _HEADER_TEXTS[key]
+
+
 def _make_abspath(value):
     """Homogenize files to have absolute paths."""
     value = value.strip()
@@ -139,36 +403,70 @@ def _make_abspath(value):
     return value
 
 
+def _similarity(text, line):
+    """Return number of characters in common and similarity ratio of strings."""
+    import difflib
+
+    obj = difflib.SequenceMatcher(None, text, line)
+    return sum(block[2] for block in obj.get_matching_blocks()), obj.ratio()
+
+
 def _valid_file(value):
     """Check that a file exists and returned it converted to absolute path."""
     value = _make_abspath(value)
-    if not os.path.exists(value):
+    if not content.exists(value):
         raise argparse.ArgumentTypeError("File {0} does not exist".format(value))
     return value
 
 
+@timings.timed("header")
 def check_header(argv=None):
     """Run aspell and report line number in which misspelled words are."""
     argv = sys.argv[1:] if argv is None else argv
     # Apparently the personal dictionary cannot be a relative path
     parser = argparse.ArgumentParser()
     parser.add_argument("-e", "--exclude", nargs=1, type=_valid_file, required=False)
+    parser.add_argument("--fix", action="store_true")
+    parser.add_argument("--jobs", nargs=1, type=int, default=[cpu_count()])
+    parser.add_argument("--staged", action="store_true")
     parser.add_argument("files", nargs="*", type=_valid_file)
     cli_args = parser.parse_args(argv)
+    if cli_args.staged and cli_args.fix:
+        # Fixes are written to the working tree, not to the index
+        parser.error("--staged and --fix cannot be used together")
     ###
     fnames = cli_args.files
     if cli_args.exclude:
-        patterns = [_make_abspath(item) for item in _read_file(cli_args.exclude[0])]
-        exclude_filter = lambda x: not any(fnmatch(x, pattern) for pattern in patterns)
-        fnames = filter(exclude_filter, fnames)
+        with timings.phase("exclude"):
+            fnames = read_matcher(cli_args.exclude[0]).filter(fnames)
+    if cli_args.staged:
+        # The Git index is only read for staged runs
+        from pre_commit_hooks import staged
+
+        if staged.preload(fnames) is None:
+            parser.error("staged contents could not be read from the Git index")
     ###
     fdict = {".py": "#", ".rst": "..", ".ini": "#", ".sh": "#", ".cfg": "#"}
     retval = 0
+    failed = []
     for fname in fnames:
         _, ext = os.path.splitext(fname)
-        if (ext in fdict) and _check_header(fname, StreamFile, fdict[ext]):
+        if ext not in fdict:
+            continue
+        with timings.phase("check", fname):
+            failed_check = _check_header(fname, StreamFile, fdict[ext])
+        if failed_check:
             retval = 1
             print("    " + fname.strip())
+            failed.append((fname, fdict[ext]))
+    if cli_args.fix and failed:
+        for fname, _ in failed:
+            content.forget(fname)
+        with timings.phase("fix"):
+            fixed_files = _fix_files(failed, cli_args.jobs[0])
+        for (fname, _), fixed in zip(failed, fixed_files):
+            if not fixed:
+                print("Header of {0} could not be fixed".format(fname), file=sys.stderr)
     return retval
 
 
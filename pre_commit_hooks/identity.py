@@ -2,20 +2,43 @@
 # identity.py
 # Copyright (c) 2019 Pablo Acosta-Serafini
 # See LICENSE for details
-# pylint: disable=C0111
+# pylint: disable=C0111,C0415,R0912
 
 # Standard library imports
 from __future__ import print_function
 import argparse
 import os
 import re
-import subprocess
+import shlex
 import sys
 
+# Intra-package imports
+from pre_commit_hooks import client, content, timings
+
+###
+# Global variables
+###
+# Author index cache, keyed by file name, of (mtime, size, index) tuples;
+# it lasts between runs when the hook runs in the checker daemon
+_AUTHORS = {}
+
 
 ###
 # Functions
 ###
+def _author_index(fname):
+    """Return set of (name, email) tuples of authors, cached by file mtime."""
+    if not os.path.exists(fname):
+        raise RuntimeError("File {} not found".format(fname))
+    fname = os.path.abspath(fname)
+    stat = os.stat(fname)
+    entry = _AUTHORS.get(fname)
+    if (entry is None) or (entry[:2] != (stat.st_mtime, stat.st_size)):
+        entry = (stat.st_mtime, stat.st_size, frozenset(_authors(fname)))
+        _AUTHORS[fname] = entry
+    return entry[2]
+
+
 def _authors(fname):
     """Parse file and return user name and email of authors.
 
@@ -24,8 +47,7 @@ def _authors(fname):
     """
     if not os.path.exists(fname):
         raise RuntimeError("File {} not found".format(fname))
-    with open(fname, "r") as obj:
-        lines = [_tostr(item.strip()) for item in obj.readlines()]
+    lines = [item.strip() for item in content.read_lines(fname)]
     regexp = re.compile(r"(?:\s*\*\s+)?(.*)\s+<(.*)>.*")
     for line in lines:
         match = regexp.match(line)
@@ -34,45 +56,281 @@ def _authors(fname):
             yield name, email
 
 
+def _config_key(key):
+    """Normalize configuration key, section and name are case-insensitive."""
+    items = key.split(".")
+    if len(items) < 2:
+        raise ValueError("Invalid configuration key {}".format(key))
+    return ".".join([items[0].lower()] + items[1:-1] + [items[-1].lower()])
+
+
+def _config_value(text, pos):
+    """Parse configuration value starting at position, return value and rest."""
+    escapes = {"n": "\n", "t": "\t", "b": "\b", "\\": "\\", '"': '"'}
+    value, pending, quoted = [], "", False
+    while pos < len(text):
+        char = text[pos]
+        pos += 1
+        if char == "\\":
+            if pos >= len(text):
+                break
+            char = text[pos]
+            pos += 1
+            if char == "\n":
+                # Line continuation
+                continue
+            if char not in escapes:
+                raise ValueError("Invalid escape sequence in configuration")
+            value.append(pending + escapes[char])
+            pending = ""
+        elif char == '"':
+            value.append(pending)
+            pending, quoted = "", not quoted
+        elif (char in ";#") and (not quoted):
+            break
+        elif char == "\n":
+            if quoted:
+                raise ValueError("Unterminated quoted configuration value")
+            break
+        elif char.isspace() and (not quoted):
+            # Inner white space is kept, trailing white space is not
+            pending += char if value else ""
+        else:
+            value.append(pending + char)
+            pending = ""
+    while (pos < len(text)) and (text[pos - 1] != "\n"):
+        pos += 1
+    return "".join(value), pos
+
+
 def _git_cfg(token):
     """Return value of Git configuration field/token."""
+    # Git is only run if its configuration files could not be parsed
+    import subprocess
+
+    timings.count("subprocesses")
     stdout, _ = subprocess.Popen(
         ["git", "config", token], stdout=subprocess.PIPE, stderr=subprocess.PIPE
     ).communicate()
-    return _tostr(stdout).strip()
+    return content.tostr(stdout).strip()
+
+
+def _git_config():
+    """
+    Return Git configuration as a dictionary, read in-process.
+
+    Files are read in the same order Git does (system, global, repository
+    and worktree), following include and includeIf directives, and
+    configuration passed through the environment goes last
+    """
+    git_dir = _git_dir()
+    common_dir = git_dir
+    if git_dir and os.path.isfile(os.path.join(git_dir, "commondir")):
+        with open(os.path.join(git_dir, "commondir"), "r") as fobj:
+            common_dir = os.path.join(git_dir, fobj.read().strip())
+    config = {}
+    if not os.environ.get("GIT_CONFIG_NOSYSTEM"):
+        _read_config(os.environ.get("GIT_CONFIG_SYSTEM") or _system_config(), config)
+    home = os.path.expanduser("~")
+    if "GIT_CONFIG_GLOBAL" in os.environ:
+        _read_config(os.environ["GIT_CONFIG_GLOBAL"], config, git_dir)
+    else:
+        xdg_dir = os.environ.get("XDG_CONFIG_HOME") or os.path.join(home, ".config")
+        _read_config(os.path.join(xdg_dir, "git", "config"), config, git_dir)
+        _read_config(os.path.join(home, ".gitconfig"), config, git_dir)
+    if git_dir:
+        _read_config(os.path.join(common_dir, "config"), config, git_dir)
+        worktree_config = config.get("extensions.worktreeconfig", "false")
+        if worktree_config.lower() in ["true", "yes", "on", "1", ""]:
+            _read_config(os.path.join(git_dir, "config.worktree"), config, git_dir)
+    # Parameters of git -c, inherited by hooks
+    for item in shlex.split(os.environ.get("GIT_CONFIG_PARAMETERS", "")):
+        key, _, value = item.partition("=")
+        config[_config_key(key)] = value
+    for num in range(int(os.environ.get("GIT_CONFIG_COUNT", "0") or "0")):
+        key = os.environ["GIT_CONFIG_KEY_{}".format(num)]
+        config[_config_key(key)] = os.environ["GIT_CONFIG_VALUE_{}".format(num)]
+    return config
 
 
-def _tostr(line):  # pragma: no cover
-    return (
-        line
-        if isinstance(line, str)
-        else (line.decode() if sys.hexversion > 0x03000000 else line.encode())
+def _git_dir():
+    """Return Git directory of current repository, empty if none."""
+    if os.environ.get("GIT_DIR"):
+        return os.path.abspath(os.environ["GIT_DIR"])
+    return client.git_dir()
+
+
+def _glob_regexp(pattern, flags=0):
+    """Compile Git wildmatch pattern, where ** matches across directories."""
+    regexp = ""
+    pos = 0
+    while pos < len(pattern):
+        if pattern.startswith("**/", pos):
+            regexp, pos = regexp + "(?:.*/)?", pos + 3
+        elif pattern.startswith("**", pos):
+            regexp, pos = regexp + ".*", pos + 2
+        elif pattern[pos] == "*":
+            regexp, pos = regexp + "[^/]*", pos + 1
+        elif pattern[pos] == "?":
+            regexp, pos = regexp + "[^/]", pos + 1
+        else:
+            regexp, pos = regexp + re.escape(pattern[pos]), pos + 1
+    return re.compile("^" + regexp + "$", flags)
+
+
+def _include_applies(condition, fname, git_dir):
+    """Check whether includeIf condition is met."""
+    for prefix, flags in [("gitdir:", 0), ("gitdir/i:", re.IGNORECASE)]:
+        if condition.startswith(prefix):
+            if not git_dir:
+                return False
+            pattern = condition[len(prefix) :]
+            if pattern.startswith("~/"):
+                pattern = os.path.expanduser(pattern)
+            elif pattern.startswith("./"):
+                pattern = os.path.join(os.path.dirname(fname), pattern[2:])
+            elif not os.path.isabs(pattern):
+                pattern = "**/" + pattern
+            pattern += "**" if pattern.endswith("/") else ""
+            path = os.path.realpath(git_dir).replace(os.sep, "/")
+            regexp = _glob_regexp(pattern.replace(os.sep, "/"), flags)
+            return bool(regexp.match(path) or regexp.match(path + "/"))
+    if condition.startswith("onbranch:"):
+        head = os.path.join(git_dir, "HEAD") if git_dir else ""
+        if not os.path.isfile(head):
+            return False
+        with open(head, "r") as fobj:
+            ref = fobj.read().strip()
+        if not ref.startswith("ref: refs/heads/"):
+            return False
+        pattern = condition[len("onbranch:") :]
+        pattern += "**" if pattern.endswith("/") else ""
+        return bool(_glob_regexp(pattern).match(ref[len("ref: refs/heads/") :]))
+    return False
+
+
+def _identity(config, role):
+    """Return name and email Git uses for the author or committer role."""
+    name = (
+        os.environ.get("GIT_{}_NAME".format(role.upper()))
+        or config.get("{}.name".format(role))
+        or config.get("user.name", "")
+    )
+    email = (
+        os.environ.get("GIT_{}_EMAIL".format(role.upper()))
+        or config.get("{}.email".format(role))
+        or config.get("user.email")
+        or os.environ.get("EMAIL", "")
+    )
+    return name, email
+
+
+def _read_config(fname, config, git_dir="", depth=0):
+    """Add entries of a Git configuration file and its includes to dictionary."""
+    if (not fname) or (depth > 10) or (not os.path.isfile(fname)):
+        return
+    with open(fname, "rb") as fobj:
+        text = fobj.read().decode("utf-8", "replace")
+    section_regexp = re.compile(
+        r'\s*\[\s*([-\w.]+)(?:\s+"((?:[^"\\\n]|\\.)*)")?\s*\]', re.UNICODE
     )
+    key_regexp = re.compile(r"\s*([a-zA-Z][-a-zA-Z0-9]*)\s*(=?)", re.UNICODE)
+    section = None
+    pos = 0
+    while pos < len(text):
+        match = section_regexp.match(text, pos)
+        if match:
+            name, subsection = match.groups()
+            # Subsection names are case-sensitive, the deprecated
+            # [section.subsection] syntax is not
+            section = name.lower()
+            if subsection is not None:
+                section += "." + re.sub(r"\\(.)", r"\1", subsection)
+            pos = match.end()
+            continue
+        line_end = text.find("\n", pos)
+        line_end = len(text) if line_end == -1 else line_end
+        line = text[pos:line_end].strip()
+        if (not line) or (line[0] in ";#"):
+            pos = line_end + 1
+            continue
+        match = key_regexp.match(text, pos)
+        if (not match) or (section is None):
+            raise ValueError("Invalid configuration line in {}".format(fname))
+        key = section + "." + match.group(1).lower()
+        if match.group(2):
+            value, pos = _config_value(text, match.end())
+        else:
+            # Key without value is a boolean true
+            value = "true"
+            pos = line_end + 1
+        config[key] = value
+        if key == "include.path":
+            _read_include(value, fname, config, git_dir, depth)
+        elif key.startswith("includeif.") and key.endswith(".path"):
+            condition = key[len("includeif.") : -len(".path")]
+            if _include_applies(condition, fname, git_dir):
+                _read_include(value, fname, config, git_dir, depth)
+
+
+def _read_include(path, fname, config, git_dir, depth):
+    """Read included configuration file, relative to the including file."""
+    path = os.path.expanduser(path)
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.abspath(fname)), path)
+    _read_config(path, config, git_dir, depth + 1)
+
+
+def _system_config():
+    """Return system-wide configuration file of the Git executable in use."""
+    for sdir in os.environ.get("PATH", "").split(os.pathsep):
+        git = os.path.join(sdir, "git")
+        if os.path.isfile(git) or os.path.isfile(git + ".exe"):
+            prefix = os.path.dirname(os.path.dirname(os.path.realpath(git)))
+            fname = os.path.join(prefix, "etc", "gitconfig")
+            if (prefix != "/usr") and os.path.isfile(fname):
+                return fname
+            break
+    return "/etc/gitconfig"
 
 
+@timings.timed("identity")
 def check_identity(argv=None):
     """Script entry point."""
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "-a", "--author-file", help="Author(s) file", nargs=1, required=True
     )
+    parser.add_argument(
+        "--committer", action="store_true", help="Check committer identity too"
+    )
     parser.add_argument("files", nargs="*", help="Files in commit")
     args = parser.parse_args(argv)
     author_file = args.author_file[0]
     #
-    git_name = _git_cfg("user.name")
-    git_email = _git_cfg("user.email")
+    with timings.phase("git_config"):
+        try:
+            config = _git_config()
+            identities = [
+                ("Author", _identity(config, "author")),
+                ("Committer", _identity(config, "committer")),
+            ]
+        except (IOError, OSError, ValueError):
+            # Fall back to Git itself if configuration could not be parsed
+            identities = [("Author", (_git_cfg("user.name"), _git_cfg("user.email")))]
+    if (not args.committer) or (identities[-1][1] == identities[0][1]):
+        identities = identities[:1]
+    with timings.phase("authors"):
+        index = _author_index(author_file)
     retval = 0
-    for name, email in _authors(author_file):
-        if (git_name, git_email) == (name, email):
-            break
-    else:
-        print(
-            "Author {} <{}> not found in {} file".format(
-                git_name, git_email, author_file
+    for role, (git_name, git_email) in identities:
+        if (git_name, git_email) not in index:
+            print(
+                "{} {} <{}> not found in {} file".format(
+                    role, git_name, git_email, author_file
+                )
             )
-        )
-        retval = 1
+            retval = 1
     return retval
 
 
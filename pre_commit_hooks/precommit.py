@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# precommit.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,C0415
+
+# Standard library imports
+from __future__ import print_function
+import argparse
+import glob
+import os
+import subprocess
+import sys
+
+# Intra-package imports
+from pre_commit_hooks import timings
+from pre_commit_hooks.compat import cpu_count
+
+###
+# Global variables
+###
+# Object name of the empty tree, to diff against in a repository without
+# commits
+_EMPTY_TREE = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+_NON_ASCII_MSG = (
+    "Error: attempt to add a non-ASCII file name.\n"
+    "This can cause problems if you want to work with people on\n"
+    "other platforms. To be portable it is advisable to rename\n"
+    "the file. If you know what you are doing you can disable\n"
+    " this check using:\n"
+    "    git config hooks.allownonascii true\n"
+)
+
+
+###
+# Functions
+###
+def _check_code_standard(top_dir, fnames, jobs):
+    """Run Pylint once on all staged Python files."""
+    rcfile = os.path.join(top_dir, ".pylintrc")
+    if not os.path.isfile(rcfile):
+        print("Pylint config file {0} not found".format(rcfile))
+        return 1
+    cmd = ["pylint", "--rcfile={0}".format(rcfile), "--jobs={0}".format(jobs)]
+    env = dict(os.environ)
+    plugin_dir = os.path.join(os.environ.get("REPO_DIR", ""), "pylint_plugins")
+    if os.path.isdir(plugin_dir):
+        plugins = sorted(
+            os.path.splitext(os.path.basename(fname))[0]
+            for fname in glob.glob(os.path.join(plugin_dir, "*.py"))
+        )
+        if plugins:
+            cmd.append("--load-plugins={0}".format(",".join(plugins)))
+        env["PYTHONPATH"] = os.pathsep.join(
+            [item for item in [env.get("PYTHONPATH"), plugin_dir] if item]
+        )
+    timings.count("subprocesses")
+    try:
+        obj = subprocess.Popen(
+            cmd + fnames, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env
+        )
+    except (IOError, OSError) as error:
+        print("Pylint could not be run: {0}".format(error))
+        return 1
+    stdout, _ = obj.communicate()
+    if obj.returncode:
+        print(stdout.decode("utf-8", "replace").rstrip())
+        return 1
+    return 0
+
+
+def _check_email(top_dir):
+    """Check Git author against the authors file."""
+    from pre_commit_hooks import identity
+
+    fname = os.path.join(top_dir, "AUTHORS.rst")
+    if not os.path.isfile(fname):
+        print("Email check could not be done, {0} not found".format(fname))
+        return 1
+    return identity.check_identity(["--author-file", fname])
+
+
+def _check_non_ascii(against):
+    """Check that no file with a non-ASCII name is being added."""
+    if _git("config", "--bool", "hooks.allownonascii")[1].strip() == b"true":
+        return 0
+    names = _git("diff", "--cached", "--name-only", "--diff-filter=A", "-z", against)
+    # Printable ASCII characters go from space to tilde
+    if any((byte < 0x20 or byte > 0x7E) for byte in bytearray(names[1]) if byte):
+        print(_NON_ASCII_MSG)
+        return 1
+    return 0
+
+
+def _check_pep257(top_dir, fnames, jobs):
+    """Run pydocstyle once, in this process, on all staged Python files."""
+    from pre_commit_hooks import pydocstyle_wrapper
+
+    rcfile = os.path.join(top_dir, ".pydocstyle")
+    if not os.path.isfile(rcfile):
+        print("Pydocstyle config file {0} not found".format(rcfile))
+        return 1
+    return pydocstyle_wrapper.check_pydocstyle(
+        ["--config={0}".format(rcfile), "--jobs", str(jobs)] + fnames
+    )
+
+
+def _check_trailing_white_space(against):
+    """Check that staged changes do not have white space errors."""
+    retcode, stdout = _git("diff-index", "--check", "--cached", against, "--")
+    if retcode or stdout.strip():
+        print(stdout.decode("utf-8", "replace").rstrip())
+        return 1
+    return 0
+
+
+def _git(*args):
+    """Return exit code and standard output of a Git command."""
+    timings.count("subprocesses")
+    obj = subprocess.Popen(
+        ["git"] + list(args), stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    stdout, _ = obj.communicate()
+    return obj.returncode, stdout
+
+
+def _staged_python_files(top_dir):
+    """Return staged Python files, except deleted ones."""
+    stdout = _git("diff", "--cached", "--name-only", "--diff-filter=d", "-z")[1]
+    return [
+        os.path.relpath(os.path.join(top_dir, fname))
+        for fname in stdout.decode("utf-8", "replace").split("\0")
+        if fname.endswith(".py")
+    ]
+
+
+@timings.timed("precommit")
+def check_commit(argv=None):
+    """
+    Git pre-commit hook entry point.
+
+    Checks run in order and the first one that fails stops the commit. Pylint
+    and pydocstyle are each run once on all staged Python files
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--non-ascii-file-names", action="store_true")
+    parser.add_argument("--trailing-white-space", action="store_true")
+    parser.add_argument("--code-standard", action="store_true")
+    parser.add_argument("--pep257", action="store_true")
+    parser.add_argument("--email", action="store_true")
+    parser.add_argument("--jobs", nargs=1, type=int, default=[cpu_count()])
+    parser.add_argument("-v", "--verbose", action="store_true")
+    cli_args = parser.parse_args(argv)
+    ###
+    retcode, stdout = _git("rev-parse", "--show-toplevel")
+    if retcode:
+        print("Not in a Git working tree")
+        return 1
+    top_dir = stdout.decode("utf-8", "replace").strip()
+    against = "HEAD" if not _git("rev-parse", "--verify", "HEAD")[0] else _EMPTY_TREE
+    fnames = None
+    checks = [
+        (
+            "non_ascii_file_names",
+            "Checking for non-ASCII file names",
+            lambda: _check_non_ascii(against),
+        ),
+        (
+            "trailing_white_space",
+            "Checking for trailing whitespace",
+            lambda: _check_trailing_white_space(against),
+        ),
+        (
+            "code_standard",
+            "Validating Python PEP8 compliance with Pylint",
+            lambda: _check_code_standard(top_dir, fnames, cli_args.jobs[0]),
+        ),
+        (
+            "pep257",
+            "Validating Python PEP257 compliance with pydocstyle",
+            lambda: _check_pep257(top_dir, fnames, cli_args.jobs[0]),
+        ),
+        ("email", "Checking Git author information", lambda: _check_email(top_dir)),
+    ]
+    for name, desc, func in checks:
+        if not getattr(cli_args, name):
+            continue
+        if name in ("code_standard", "pep257"):
+            fnames = _staged_python_files(top_dir) if fnames is None else fnames
+            if not fnames:
+                continue
+        if cli_args.verbose:
+            print("\t" + desc)
+        sys.stdout.flush()
+        with timings.phase(name):
+            retval = func()
+        if retval:
+            return retval
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(check_commit(sys.argv[1:]))
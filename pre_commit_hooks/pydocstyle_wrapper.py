@@ -2,24 +2,185 @@
 # pydocstyle_wrapper.py
 # Copyright (c) 2019 Pablo Acosta-Serafini
 # See LICENSE for details
-# pylint: disable=C0111,W0613
+# pylint: disable=C0111,C0415
 
 # Standard library imports
+from __future__ import print_function
+import argparse
+import io
+import os
 import re
 import sys
+import tokenize
 
-# PyPI imports
-from pydocstyle.cli import main
+# Intra-package imports
+from pre_commit_hooks import content, timings
+from pre_commit_hooks.cache import default_dir, digest, file_digest, open_cache
+from pre_commit_hooks.compat import cpu_count
+
+###
+# Global variables
+###
+# Names of the ConventionChecker.check_source keyword arguments that follow the
+# file name and error codes in the tuples generated by
+# ConfigurationParser.get_files_to_check, which gained items over pydocstyle
+# releases
+_CHECK_ARGS = ("ignore_decorators", "property_decorators", "ignore_self_only_init")
 
 
 ###
 # Functions
 ###
+def _check_file(item):
+    """
+    Check one file with the configuration found for it.
+
+    Returns a list of violation messages and a list of other errors (file
+    could not be read or parsed), which are logged the way pydocstyle does
+    """
+    from pydocstyle.checker import ConventionChecker
+    from pydocstyle.parser import AllError, ParseError
+    from pydocstyle.utils import log
+
+    fname, codes = item[:2]
+    kwargs = dict(zip(_CHECK_ARGS, item[2:]))
+    violations, errors = [], []
+    try:
+        source = _source(fname)
+        with timings.phase("check_file", fname):
+            for error in ConventionChecker().check_source(source, fname, **kwargs):
+                if getattr(error, "code", None) in codes:
+                    violations.append(str(error))
+    except (EnvironmentError, AllError, ParseError) as error:
+        log.warning("Error in file %s: %s", fname, error)
+        errors.append(str(error))
+    except tokenize.TokenError:
+        errors.append("invalid syntax in file {0}".format(fname))
+    return violations, errors
+
+
+def _check_files(items, jobs):
+    """Check files, in parallel batches of files."""
+    batch = 16
+    jobs = min(jobs, (len(items) + batch - 1) // batch)
+    if jobs < 2:
+        return [_check_file(item) for item in items]
+    import multiprocessing
+
+    pool = multiprocessing.Pool(jobs)
+    try:
+        return pool.map(_check_file, items, chunksize=batch)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _files_to_check(argv):
+    """Return run configuration and per-file configuration tuples."""
+    from pydocstyle.cli import setup_stream_handlers
+    from pydocstyle.config import ConfigurationParser
+
+    conf = ConfigurationParser()
+    # The configuration parser only reads its options from sys.argv
+    sys_argv = sys.argv
+    sys.argv = [sys_argv[0] if sys_argv else "pydocstyle"] + argv
+    try:
+        conf.parse()
+    finally:
+        sys.argv = sys_argv
+    run_conf = conf.get_user_run_configuration()
+    setup_stream_handlers(run_conf)
+    return run_conf, [tuple(item) for item in conf.get_files_to_check()]
+
+
+def _result_key(item, run_conf):
+    """Return cache key of a file check, empty if file cannot be read."""
+    import pydocstyle
+
+    fdigest = file_digest(item[0])
+    if not fdigest:
+        return ""
+    return digest(
+        pydocstyle.__version__,
+        os.path.abspath(item[0]),
+        fdigest,
+        item[0],
+        " ".join(sorted(item[1])),
+        repr(item[2:]),
+        "explain" if run_conf.explain else "",
+        "source" if run_conf.source else "",
+    )
+
+
+def _source(fname):
+    """Return Python source file decoded as tokenize.open does."""
+    obj = content.get(fname)
+    if obj is None:
+        raise IOError("File {0} could not be read".format(fname))
+    encoding, _ = tokenize.detect_encoding(obj.stream().readline)
+    return io.TextIOWrapper(obj.stream(), encoding, line_buffering=True).read()
+
+
+@timings.timed("pydocstyle")
 def check_pydocstyle(argv=None):
     """Script entry point."""
-    return main()
+    # pylint: disable=R0914
+    # pydocstyle takes longer to import than the rest of the hook, so it is
+    # only imported when files are checked in this process
+    from pydocstyle.config import IllegalConfiguration
+    from pydocstyle.violations import Error
+
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--cache-dir", nargs=1, required=False)
+    parser.add_argument("--cache-size", nargs=1, type=int, default=[10000])
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--jobs", nargs=1, type=int, default=[cpu_count()])
+    cli_args, pargs = parser.parse_known_args(argv)
+    try:
+        with timings.phase("configuration"):
+            run_conf, items = _files_to_check(pargs)
+    except IllegalConfiguration as error:
+        if error.args:
+            print(error.args[0], file=sys.stderr)
+        return 2
+    Error.explain = run_conf.explain
+    Error.source = run_conf.source
+    #
+    cache_dir = (
+        cli_args.cache_dir[0] if cli_args.cache_dir else default_dir("pydocstyle")
+    )
+    rcache = None
+    if cache_dir and (not cli_args.no_cache):
+        rcache = open_cache(
+            os.path.join(cache_dir, "results.json"), cli_args.cache_size[0]
+        )
+    timings.track_cache("results", rcache)
+    with timings.phase("cache_lookup"):
+        keys = [_result_key(item, run_conf) if rcache else "" for item in items]
+        results = [rcache.get(key) if key else None for key in keys]
+    pending = [num for num, result in enumerate(results) if result is None]
+    with timings.phase("check"):
+        checked = _check_files([items[num] for num in pending], cli_args.jobs[0])
+    count = 0
+    for num, (violations, errors) in zip(pending, checked):
+        results[num] = violations
+        # Errors are logged by the checker; files that could not be checked
+        # are not cached, to report the problem on every run
+        count += len(errors)
+        if keys[num] and (not errors):
+            rcache.put(keys[num], violations)
+    for violations in results:
+        count += len(violations)
+        for violation in violations:
+            print(violation)
+    if rcache:
+        rcache.save()
+    if run_conf.count:
+        print(count)
+    return int(bool(count))
 
 
 if __name__ == "__main__":
     sys.argv[0] = re.sub(r"(-script\.pyw?|\.exe)?$", "", sys.argv[0])
-    sys.exit(check_pydocstyle(sys.argv))
+    sys.exit(check_pydocstyle(sys.argv[1:]))
@@ -2,7 +2,7 @@
 # pylint_codes.py
 # Copyright (c) 2019 Pablo Acosta-Serafini
 # See LICENSE for details
-# pylint: disable=C0103,C0111,R0912
+# pylint: disable=C0103,C0111,C0415,R0912
 
 # Standard library imports
 from __future__ import print_function
@@ -11,6 +11,9 @@ import os
 import re
 import sys
 
+# Intra-package imports
+from pre_commit_hooks import content, timings
+
 ###
 # Global variables
 ###
@@ -21,8 +24,70 @@ IS_PY3 = sys.hexversion > 0x03000000
 # Functions
 ###
 def _check_pylint_codes(fname):
-    """Check that there are no repeated Pylint codes per file."""
-    # pylint: disable=R0914
+    """
+    Check that there are no repeated Pylint codes per file.
+
+    Pylint disable directives have to be on their own line with codes sorted
+    alphabetically and not disabled before in the file. Returns a list of
+    (line number, message) tuples, empty if the file complies
+    """
+    obj = content.get(fname)
+    if (obj is None) or (obj.find(b"pylint") == -1):
+        return []
+    # Files are only tokenized if a line may have a directive
+    linenos = _candidate_lines(obj)
+    if not linenos:
+        return []
+    import tokenize
+
+    try:
+        directives = _token_directives(obj, linenos)
+    except (SyntaxError, tokenize.TokenError):
+        directives = _line_directives(obj, linenos)
+    ret = []
+    file_tokens = set()
+    for num, standalone, codes in directives:
+        if not standalone:
+            ret.append((num, "Pylint disable directive not on its own line"))
+            continue
+        unsorted_tokens = codes.rstrip().split(",")
+        sorted_tokens = sorted(unsorted_tokens)
+        if unsorted_tokens != sorted_tokens:
+            ret.append((num, "codes not sorted: " + ",".join(unsorted_tokens)))
+        repeated = sorted(
+            set(
+                item
+                for pos, item in enumerate(sorted_tokens)
+                if (item in file_tokens) or (item in sorted_tokens[:pos])
+            )
+        )
+        if repeated:
+            ret.append((num, "codes repeated: " + ",".join(repeated)))
+        file_tokens.update(sorted_tokens)
+    return ret
+
+
+def _candidate_lines(obj):
+    """
+    Return numbers of lines of a file that may have a Pylint directive.
+
+    Lines without a comment character and the word pylint are skipped
+    without decoding
+    """
+    return set(
+        num
+        for num, line in enumerate(obj.raw_lines(), 1)
+        if (b"#" in line) and (b"pylint" in line)
+    )
+
+
+def _line_directives(obj, linenos):
+    """
+    Return Pylint disable directives of a file that cannot be tokenized.
+
+    Directives are (line number, whether it is on its own line, codes)
+    tuples; only the given candidate lines are looked at
+    """
     rec = re.compile
     soline = rec(r"(^\s*)#\s*pylint\s*:\s*disable\s*=\s*([\w|\s|,]+)\s*")
     # Regular expression to get a Pylint disable directive but only
@@ -30,59 +95,85 @@ def _check_pylint_codes(fname):
     template = r"#\s*pylint:\s*disable\s*=\s*([\w|\s|\s*,\s*]+)"
     quoted_eol = rec(r'(.*)(\'|")\s*' + template + r"\s*\2\s*")
     eol = rec(r"(.*)\s*" + template + r"\s*")
-    file_tokens = []
-    for input_line in _read_file(fname):
-        line_match = soline.match(input_line)
+    ret = []
+    for num, line in enumerate(obj.raw_lines(), 1):
+        if num not in linenos:
+            continue
+        line = content.tostr(line).rstrip()
+        line_match = soline.match(line)
+        if line_match:
+            ret.append((num, True, line_match.groups()[1]))
+            continue
         quoted_eol_match = quoted_eol.match(
-            input_line.replace("\\n", "\n").replace("\\r", "\r")
+            line.replace("\\n", "\n").replace("\\r", "\r")
         )
-        eol_match = eol.match(input_line)
-        if eol_match and (not quoted_eol_match) and (not line_match):
-            return True
-        if line_match:
-            unsorted_tokens = line_match.groups()[1].rstrip().split(",")
-            sorted_tokens = sorted(unsorted_tokens)
-            if any([item in file_tokens for item in sorted_tokens]) or (
-                unsorted_tokens != sorted_tokens
-            ):
-                return True
-            file_tokens.extend(sorted_tokens)
-    return False
+        eol_match = eol.match(line)
+        if eol_match and (not quoted_eol_match):
+            ret.append((num, False, eol_match.groups()[1]))
+    return ret
 
 
-def _read_file(fname):
-    """Return file lines as strings."""
-    with open(fname) as fobj:
-        for line in fobj:
-            yield _tostr(line).rstrip()
+def _token_directives(obj, linenos):
+    """
+    Return Pylint disable directives of a Python file.
 
+    Directives are (line number, whether it is on its own line, codes)
+    tuples; only comment tokens of the given candidate lines are looked at,
+    so directive-like text in strings is ignored
+    """
+    import tokenize
 
-def _tostr(obj):  # pragma: no cover
-    """Convert to string if necessary."""
-    return obj if isinstance(obj, str) else (obj.decode() if IS_PY3 else obj.encode())
+    regexp = re.compile(r"#\s*pylint\s*:\s*disable\s*=\s*([\w|\s|,]+)")
+    readline = obj.stream().readline
+    # Python 3 tokenizer decodes the source with its declared encoding
+    tokens = (
+        tokenize.tokenize(readline) if IS_PY3 else tokenize.generate_tokens(readline)
+    )
+    ret = []
+    for token in tokens:
+        if (token[0] != tokenize.COMMENT) or (token[2][0] not in linenos):
+            continue
+        match = regexp.search(token[1])
+        if match:
+            (num, col), line = token[2], token[4]
+            standalone = (not line[:col].strip()) and (match.start() == 0)
+            ret.append((num, standalone, match.group(1)))
+    return ret
 
 
 def _valid_file(value):
     """Check that a file exists and returned it converted to absolute path."""
     if not os.path.isabs(value):
         value = os.path.abspath(os.path.join(os.getcwd(), value))
-    if not os.path.exists(value):
+    if not content.exists(value):
         raise argparse.ArgumentTypeError("File {0} does not exist".format(value))
     return value
 
 
+@timings.timed("pylint_codes")
 def check_pylint_codes(argv=None):
     """Run aspell and report line number in which misspelled words are."""
     argv = sys.argv[1:] if argv is None else argv
     parser = argparse.ArgumentParser()
+    parser.add_argument("--staged", action="store_true")
     parser.add_argument("files", nargs="*", type=_valid_file)
     cli_args = parser.parse_args(argv)
     fnames = cli_args.files
+    if cli_args.staged:
+        # The Git index is only read for staged runs
+        from pre_commit_hooks import staged
+
+        if staged.preload(fnames) is None:
+            parser.error("staged contents could not be read from the Git index")
     retval = 0
     for fname in fnames:
-        if _check_pylint_codes(fname):
+        with timings.phase("check", fname):
+            diagnostics = _check_pylint_codes(fname)
+        if diagnostics:
             retval = 1
             print("    " + fname)
+            for num, msg in diagnostics:
+                print("        line {0}: {1}".format(num, msg))
     return retval
 
 
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# runner.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111
+
+# Standard library imports
+from __future__ import print_function
+import argparse
+import importlib
+import os
+import shlex
+import sys
+
+# Intra-package imports
+from pre_commit_hooks import content, timings
+
+###
+# Global variables
+###
+# Hook name, description, module, entry point and file filter, in the order
+# hooks are run
+_HOOKS = [
+    ("header", "file headers", "header", "check_header", None),
+    (
+        "pylint_codes",
+        "Pylint disable codes",
+        "pylint_codes",
+        "check_pylint_codes",
+        ".py",
+    ),
+    ("spelling", "spelling", "spelling", "check_spelling", "text"),
+    (
+        "pydocstyle",
+        "Python PEP257 compliance",
+        "pydocstyle_wrapper",
+        "check_pydocstyle",
+        ".py",
+    ),
+]
+
+
+###
+# Functions
+###
+def _hook_files(ftype, fnames):
+    """Return files a hook checks."""
+    if ftype is None:
+        return fnames
+    if ftype == "text":
+        return [fname for fname in fnames if not content.is_binary(fname)]
+    return [fname for fname in fnames if os.path.splitext(fname)[1] == ftype]
+
+
+def _valid_hooks(value):
+    """Check that hook names are valid and return them as a list."""
+    names = [item.strip() for item in value.split(",") if item.strip()]
+    valid = [item[0] for item in _HOOKS]
+    for name in names:
+        if name not in valid:
+            raise argparse.ArgumentTypeError("Unknown hook {0}".format(name))
+    return names
+
+
+@timings.timed("runner")
+def run_hooks(argv=None):
+    """
+    Run several hooks on the same files in one interpreter.
+
+    Files are read once into the shared content layer and every hook checks
+    them from memory. Output of each hook is preceded by a banner, and the
+    exit code is the highest one of the hooks run
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--hooks",
+        type=_valid_hooks,
+        default=[item[0] for item in _HOOKS],
+        help="Comma-separated list of hooks to run",
+    )
+    for name, desc, _, _, _ in _HOOKS:
+        parser.add_argument(
+            "--{0}-args".format(name.replace("_", "-")),
+            dest="{0}_args".format(name),
+            default="",
+            help="Additional arguments of the {0} hook".format(desc),
+        )
+    parser.add_argument("-v", "--verbose", action="store_true")
+    parser.add_argument("files", nargs="*")
+    cli_args = parser.parse_args(argv)
+    ###
+    fnames = []
+    for fname in cli_args.files:
+        if not content.exists(fname):
+            print("File {0} does not exist".format(fname), file=sys.stderr)
+            return 2
+        fnames.append(os.path.abspath(fname))
+    with timings.phase("preload"):
+        fnames = content.preload(fnames)
+    retval = 0
+    for name, desc, module, func, ftype in _HOOKS:
+        hook_fnames = _hook_files(ftype, fnames)
+        if (name not in cli_args.hooks) or (not hook_fnames):
+            continue
+        if cli_args.verbose:
+            print("\tChecking {0}".format(desc))
+        hook = getattr(importlib.import_module("pre_commit_hooks." + module), func)
+        hook_args = shlex.split(getattr(cli_args, "{0}_args".format(name)))
+        # Flush hook output so that it is not interleaved with that of
+        # subprocesses hooks may start
+        sys.stdout.flush()
+        with timings.phase(name):
+            hook_retval = hook(hook_args + hook_fnames) or 0
+        sys.stdout.flush()
+        if hook_retval:
+            print("{0}: failed (exit code {1})".format(name, hook_retval))
+        elif cli_args.verbose:
+            print("{0}: passed".format(name))
+        retval = max(retval, hook_retval)
+    return retval
+
+
+if __name__ == "__main__":
+    sys.exit(run_hooks(sys.argv[1:]))
@@ -2,140 +2,182 @@
 # spelling.py
 # Copyright (c) 2019 Pablo Acosta-Serafini
 # See LICENSE for details
-# pylint: disable=C0103,C0111,E1129,R0205,R0912,R0914,R1718,W0640,W1113
+# pylint: disable=C0103,C0111,C0415,R0205,R0912,R0914,R1718
 
 # Standard library imports
 from __future__ import print_function
 import argparse
+import codecs
 import collections
-from fnmatch import fnmatch
+import functools
 import os
-import platform
 import re
 import subprocess
 import sys
-import tempfile
-import time
-import types
-
-# PyPI imports
-import decorator
-
-# Literal copy from [...]/site-packages/pip/_vendor/compat.py
-try:
-    from shutil import which
-except ImportError:  # pragma: no cover
-    # Implementation from Python 3.3
-    def which(cmd, mode=os.F_OK | os.X_OK, path=None):
-        """Mimic CLI which function, copied from Python 3.3 implementation."""
-        # pylint: disable=C0113,W0622
-        # Check that a given file can be accessed with the correct mode.
-        # Additionally check that `file` is not a directory, as on Windows
-        # directories pass the os.access check.
-        def _access_check(fn, mode):
-            return os.path.exists(fn) and os.access(fn, mode) and not os.path.isdir(fn)
-
-        # If we're given a path with a directory part, look it up directly rather
-        # than referring to PATH directories. This includes checking relative to the
-        # current directory, e.g. ./script
-        if os.path.dirname(cmd):
-            if _access_check(cmd, mode):
-                return cmd
-            return None
-
-        if path is None:
-            path = os.environ.get("PATH", os.defpath)
-        if not path:
-            return None
-        path = path.split(os.pathsep)
-
-        if sys.platform == "win32":
-            # The current directory takes precedence on Windows.
-            if not os.curdir in path:
-                path.insert(0, os.curdir)
-
-            # PATHEXT is necessary to check on Windows.
-            pathext = os.environ.get("PATHEXT", "").split(os.pathsep)
-            # See if the given file matches any of the expected path extensions.
-            # This will allow us to short circuit when given "python.exe".
-            # If it does match, only test that one, otherwise we have to try
-            # others.
-            if any(cmd.lower().endswith(ext.lower()) for ext in pathext):
-                files = [cmd]
-            else:
-                files = [cmd + ext for ext in pathext]
-        else:
-            # On other platforms you don't have things like PATHEXT to tell you
-            # what file suffixes are executable, so just pass on cmd as-is.
-            files = [cmd]
-
-        seen = set()
-        for dir in path:
-            normdir = os.path.normcase(dir)
-            if not normdir in seen:
-                seen.add(normdir)
-                for thefile in files:
-                    name = os.path.join(dir, thefile)
-                    if _access_check(name, mode):
-                        return name
-        return None
-
+import threading
+import tokenize
+
+# Intra-package imports
+from pre_commit_hooks import content, daemon, timings
+from pre_commit_hooks.cache import (
+    LruCache,
+    default_dir,
+    digest,
+    file_digest,
+    open_cache,
+    remove_stale,
+)
+from pre_commit_hooks.compat import cpu_count, which
+from pre_commit_hooks.exclude import read_matcher
+from pre_commit_hooks.whitelist import WhitelistIndex
 
 ###
 # Global variables
 ###
-IS_PY3 = sys.hexversion > 0x03000000
+# Hunspell session pools kept between runs of the checker daemon, keyed by
+# command, encoding and engine, with the fingerprint of their dictionaries
+_POOLS = {}
+# Seconds Hunspell gets to answer, plus one second per this many bytes
+# checked
+_TIMEOUT = 15
+_TIMEOUT_RATE = 64 << 10
 
 
 ###
 # Functions
 ###
-@decorator.contextmanager
-def ignored(*exceptions):
-    try:
-        yield
-    except exceptions:
-        pass
-
-
-class TmpFile(object):
+class _Hunspell(object):
     """
-    Use a temporary file within context.
+    Hunspell session in pipe mode (-a).
 
-    From pmisc package
+    The dictionary is loaded once and lines are checked through the process
+    standard input/output for as long as the session is open
     """
 
-    def __init__(self, fpointer=None, *args, **kwargs):  # noqa
-        if (
-            fpointer
-            and (not isinstance(fpointer, types.FunctionType))
-            and (not isinstance(fpointer, types.LambdaType))
-        ):
-            raise RuntimeError("Argument `fpointer` is not valid")
-        self._fname = None
-        self._fpointer = fpointer
-        self._args = args
-        self._kwargs = kwargs
+    def __init__(self, cmd, encoding="utf-8"):  # noqa
+        self._cmd = cmd
+        self._encoding = encoding
+        self._proc = None
+        self._expired = None
+        self._banner = False
 
     def __enter__(self):  # noqa
-        fdesc, fname = tempfile.mkstemp()
-        # fdesc is an OS-level file descriptor, see problems if this
-        # is not properly closed in this post:
-        # https://www.logilab.org/blogentry/17873
-        os.close(fdesc)
-        if platform.system().lower() == "windows":  # pragma: no cover
-            fname = fname.replace(os.sep, "/")
-        self._fname = fname
-        if self._fpointer:
-            with open(self._fname, "w") as fobj:
-                self._fpointer(fobj, *self._args, **self._kwargs)
-        return self._fname
+        return self
 
     def __exit__(self, exc_type, exc_value, exc_tb):  # noqa
-        with ignored(OSError):
-            os.remove(self._fname)
+        self.close()
         return not exc_type is not None
 
+    def _batches(self, lines):
+        """Group lines so that writes never block on a full pipe buffer."""
+        batch, size = [], 0
+        for line in lines:
+            line = _tobytes(line, self._encoding).replace(b"\r", b" ")
+            line = b"^" + line.replace(b"\n", b" ") + b"\n"
+            if batch and (size + len(line) > 4096):
+                yield batch
+                batch, size = [], 0
+            batch.append(line)
+            size += len(line)
+        if batch:
+            yield batch
+
+    def _expire(self, proc, timeout):
+        """Kill Hunspell process that did not answer in time."""
+        self._expired = timeout
+        if proc.poll() is None:
+            proc.kill()
+
+    def _fail(self):
+        """Report a dead Hunspell process."""
+        if self._proc.poll() is None:
+            self._proc.kill()
+        stdout, stderr = self._proc.communicate()
+        self._proc, expired, self._expired = None, self._expired, None
+        print("COMMAND: " + (" ".join(self._cmd)))
+        print("STDOUT:" + os.linesep + content.tostr(stdout))
+        print("STDERR:" + os.linesep + content.tostr(stderr))
+        if expired is not None:
+            raise RuntimeError(
+                "hunspell command did not finish in {0:.0f} seconds".format(expired)
+            )
+        raise RuntimeError("hunspell command could not be executed successfully")
+
+    def _readline(self):
+        """Read a line of the Hunspell output."""
+        line = self._proc.stdout.readline()
+        if not line:
+            self._fail()
+        return line.decode(self._encoding, "replace").rstrip("\r\n")
+
+    def _start(self):
+        """Start Hunspell process and switch to terse mode."""
+        timings.count("subprocesses")
+        self._proc = subprocess.Popen(
+            self._cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        self._proc.stdin.write(b"!\n")
+        # The banner is read by the first check, within its time limit
+        self._banner = True
+
+    def check(self, lines):
+        """
+        Return list of misspelled words of each line.
+
+        Hunspell is killed, and the check fails, if it does not answer in a
+        time that grows with the size of the lines checked
+        """
+        lines = list(lines)
+        indexes = [num for num, line in enumerate(lines) if line.strip()]
+        ret = [[] for _ in lines]
+        if not indexes:
+            return ret
+        if self._proc is None:
+            self._start()
+        timeout = _TIMEOUT + float(sum(len(lines[num]) for num in indexes)) / (
+            _TIMEOUT_RATE
+        )
+        timer = threading.Timer(timeout, self._expire, [self._proc, timeout])
+        timer.daemon = True
+        timer.start()
+        try:
+            if self._banner:
+                self._banner = False
+                self._readline()
+            pending = iter(indexes)
+            for batch in self._batches(lines[num] for num in indexes):
+                try:
+                    self._proc.stdin.write(b"".join(batch))
+                    self._proc.stdin.flush()
+                except (IOError, OSError):
+                    self._fail()
+                for _ in batch:
+                    words = ret[next(pending)]
+                    line = self._readline()
+                    while line:
+                        if line[0] in "&#?":
+                            words.append(line.split()[1])
+                        line = self._readline()
+        finally:
+            timer.cancel()
+        if self._expired is not None:
+            # Killed right after answering, start a new process next time
+            self.close()
+            self._expired = None
+        return ret
+
+    def close(self):
+        """Terminate Hunspell process."""
+        if self._proc is not None:
+            self._proc.stdin.close()
+            self._proc.wait()
+            self._proc.stdout.close()
+            self._proc.stderr.close()
+            self._proc = None
+
 
 def _cleanup_word(word):
     """Strip out leading trailing spaces, quotes and double quotes."""
@@ -148,18 +190,322 @@ def _cleanup_word(word):
     return ""
 
 
-def _grep(fname, words):
-    """Return line numbers in which words appear in a file."""
-    # pylint: disable=W0631
-    pat = "(.*[^a-zA-Z]|^){}([^a-zA-Z].*|$)"
-    regexps = [(word, re.compile(pat.format(word))) for word in words]
+class _HunspellPool(object):
+    """
+    Hunspell sessions shared by a pool of threads.
+
+    A thread takes an idle session, or starts a new one, to check a file and
+    returns it when done, so there are never more Hunspell processes than
+    threads checking files and sessions can be reused by later runs. With a
+    built-in engine speller all threads check files with it instead
+    """
+
+    def __init__(  # noqa
+        self, cmd, encoding="utf-8", wcache=None, extract=True, index=None, speller=None
+    ):
+        self._chunk_size = 0
+        self._cmd = cmd
+        self._encoding = encoding
+        self._extract = extract
+        self._index = index
+        self._speller = speller
+        self._wcache = LruCache(None) if wcache is None else wcache
+        self._lock = threading.Lock()
+        self._idle = []
+        self._sessions = []
+
+    def __enter__(self):  # noqa
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):  # noqa
+        self.close()
+        return not exc_type is not None
+
+    def check_file(self, fname, linenos=None):
+        """Check file with an idle session."""
+        if self._speller is not None:
+            return _check_file(
+                fname,
+                self._speller,
+                self._wcache,
+                linenos,
+                self._extract,
+                self._index,
+                self._chunk_size,
+            )
+        with self._lock:
+            session = self._idle.pop() if self._idle else None
+        if session is None:
+            session = _Hunspell(self._cmd, self._encoding)
+            with self._lock:
+                self._sessions.append(session)
+        try:
+            return _check_file(
+                fname,
+                session,
+                self._wcache,
+                linenos,
+                self._extract,
+                self._index,
+                self._chunk_size,
+            )
+        finally:
+            with self._lock:
+                self._idle.append(session)
+
+    def close(self):
+        """Terminate all Hunspell sessions and release the speller, if any."""
+        for session in self._sessions:
+            session.close()
+        self._idle, self._sessions = [], []
+        if self._speller is not None:
+            self._speller.close()
+            self._speller = None
+
+    def configure(self, wcache=None, extract=True, index=None, chunk_size=0):
+        """Set word cache, text extraction, whitelist index and chunk size."""
+        self._chunk_size = chunk_size
+        self._extract = extract
+        self._index = index
+        self._wcache = LruCache(None) if wcache is None else wcache
+
+
+def _builtin_speller(names, personal=None, cache_dir=None):
+    """
+    Return built-in engine speller of (comma-separated) dictionaries.
+
+    The expanded word forms are compiled into an index in the cache
+    directory, named after the dictionary files it was compiled from, so it is
+    only rebuilt when a dictionary changes
+    """
+    from pre_commit_hooks import dictionary
+
+    fnames = _dictionary_files(names)
+    pairs = list(zip(fnames[::2], fnames[1::2]))
+    index_fname = None
+    if cache_dir:
+        items = [dictionary.INDEX_VERSION]
+        for fname in fnames:
+            stat = os.stat(fname)
+            items.append("{0} {1} {2}".format(fname, stat.st_size, stat.st_mtime))
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        index_fname = os.path.join(
+            cache_dir, "dictionary-{0}.idx".format(digest(*items)[:16])
+        )
+    with timings.phase("dictionary"):
+        return dictionary.load_speller(pairs, personal, index_fname)
+
+
+def _check_chunks(fname, session, wcache, linenos, extract, index, chunk_size):
+    """
+    Return misspelled words of a big file and the lines in which they appear.
+
+    Lines are read, checked and searched for misspelled words in chunks of
+    about chunk_size bytes, so memory use does not grow with the file size
+    """
+    ldict = collections.defaultdict(list)
+    for lines in _line_chunks(fname, linenos, extract, chunk_size):
+        words = _misspelled_words(fname, lines, session, wcache, index)
+        if words:
+            with timings.phase("grep", fname):
+                for word, nums in _grep(fname, words, lines=lines).items():
+                    ldict[word].extend(nums)
+    return [(word, ldict[word]) for word in sorted(ldict)]
+
+
+def _check_file(
+    fname, session, wcache, linenos=None, extract=True, index=None, chunk_size=0
+):
+    """Return misspelled words of a file and the lines in which they appear."""
+    obj = content.get(fname)
+    if chunk_size and (obj is not None) and (obj.size > chunk_size):
+        return _check_chunks(
+            fname, session, wcache, linenos, extract, index, chunk_size
+        )
+    with timings.phase("extract", fname):
+        lines = _file_lines(fname, linenos, extract)
+    words = _misspelled_words(fname, lines, session, wcache, index)
+    if not words:
+        return []
+    with timings.phase("grep", fname):
+        ldict = _grep(fname, words, linenos, extract, lines)
+    return [(word, ldict[word]) for word in words]
+
+
+def _check_words(words, session, wcache, index=None):
+    """
+    Return misspelled words Hunspell finds in each word.
+
+    Words in the whitelist index are correct and verdicts of the rest are
+    looked up in the word cache, only words never seen before are sent to
+    Hunspell
+    """
+    ret, pending = [], []
+    for word in words:
+        if index is not None:
+            # Strip punctuation Hunspell never considers part of a word
+            bare = word.strip('"()[]{}<>,;:!?`')
+            if bare.isalpha() and (bare in index):
+                ret.append([])
+                continue
+        verdict = wcache.get(word)
+        if verdict is None:
+            pending.append(word)
+        else:
+            ret.append(verdict.split())
+    for word, verdict in zip(pending, session.check(pending)):
+        wcache.put(word, " ".join(verdict))
+        ret.append(verdict)
+    return ret
+
+
+def _default_dictionary():
+    """Return name of the dictionary Hunspell uses when none is specified."""
+    for var in ["DICTIONARY", "LC_ALL", "LC_MESSAGES", "LANG"]:
+        value = os.environ.get(var, "").split(".")[0]
+        if value and (value not in ["C", "POSIX"]):
+            return value
+    return "en_US"
+
+
+def _dictionary_files(names):
+    """Return affix and dictionary files of (comma-separated) dictionaries."""
+    dirs = os.environ.get("DICPATH", "").split(os.pathsep) + [
+        os.getcwd(),
+        "/usr/share/hunspell",
+        "/usr/share/myspell",
+        "/usr/share/myspell/dicts",
+        "/usr/local/share/hunspell",
+        "/Library/Spelling",
+        os.path.join(os.path.expanduser("~"), "Library", "Spelling"),
+    ]
+    ret = []
+    for name in names.split(","):
+        for sdir in [""] if os.path.dirname(name) else [item for item in dirs if item]:
+            base = os.path.join(sdir, name)
+            if os.path.exists(base + ".dic"):
+                ret.extend([base + ".aff", base + ".dic"])
+                break
+    return ret
+
+
+def _fingerprint(cmd_args, cli_args):
+    """Return digest of the Hunspell configuration results depend on."""
+    names = cli_args.d[0] if cli_args.d else _default_dictionary()
+    items = [" ".join(cmd_args), which("hunspell") or ""]
+    for fname in _dictionary_files(names):
+        if os.path.exists(fname):
+            stat = os.stat(fname)
+            items.append("{0} {1} {2}".format(fname, stat.st_size, stat.st_mtime))
+    if cli_args.p:
+        items.append(file_digest(cli_args.p[0]))
+    if cli_args.whitelist_index:
+        items.append(file_digest(cli_args.whitelist_index[0]))
+    if cli_args.engine[0] == "builtin":
+        from pre_commit_hooks import dictionary
+
+        items.append("builtin " + dictionary.INDEX_VERSION)
+    return digest(*items)
+
+
+def _extract_text(fname, lines):
+    """
+    Return number and prose text of file lines.
+
+    Only comments and strings are extracted from Python files, only comments
+    from shell scripts and everything but code blocks and directives from
+    reStructuredText files; other files are returned as is
+    """
+    extractors = {"python": _python_text, "rst": _rst_text, "shell": _shell_text}
+    extractor = extractors.get(_text_type(fname))
+    ret = extractor(lines) if extractor else None
+    return list(enumerate(lines, 1) if ret is None else ret)
+
+
+def _file_lines(fname, linenos=None, extract=True):
+    """Return number and text of file lines, all lines if linenos is None."""
+    obj = content.get(fname)
+    if obj is None:
+        return []
+    if extract:
+        lines = _extract_text(fname, obj.lines())
+    elif linenos is None:
+        lines = enumerate(obj.lines(), 1)
+    else:
+        # Only the requested lines are decoded
+        count = obj.line_count()
+        lines = [
+            (num, obj.line(num, "utf-8")) for num in sorted(linenos) if num <= count
+        ]
+    return [
+        (num, line.strip())
+        for num, line in lines
+        if (linenos is None) or (num in linenos)
+    ]
+
+
+def _git(*args):
+    """Return standard output of a Git command, None if it failed."""
+    timings.count("subprocesses")
+    obj = subprocess.Popen(
+        ["git"] + list(args), stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    stdout, _ = obj.communicate()
+    return None if obj.returncode else stdout.decode("utf-8", "replace")
+
+
+def _grep(fname, words, linenos=None, extract=True, lines=None):
+    """
+    Return line numbers in which words appear in a file.
+
+    Lines, as returned by _file_lines, are read from the file if not given
+    """
+    index = _word_index(fname, linenos, extract, lines)
     ldict = collections.defaultdict(list)
-    for num, line in enumerate(_read_file(fname)):
-        for word in [word for word, regexp in regexps if regexp.match(line)]:
-            ldict[word].append(str(num + 1))
+    for word in words:
+        if word in index:
+            ldict[word] = index[word]
     return ldict
 
 
+def _hunspell_pool(cmd, encoding, fingerprint, load=None):
+    """
+    Return Hunspell session pool for a run.
+
+    If given, load returns the built-in engine speller the pool checks files
+    with. When serving requests in the checker daemon, pools (and the
+    dictionaries their sessions have loaded) are kept between runs; a pool is
+    replaced when the fingerprint of its dictionaries changes
+    """
+    if not daemon.serving():
+        return _HunspellPool(cmd, encoding, speller=load() if load else None)
+    key = (tuple(cmd), encoding, load is not None)
+    entry = _POOLS.get(key)
+    if (entry is None) or (entry[0] != fingerprint):
+        if entry is not None:
+            entry[1].close()
+        entry = (
+            fingerprint,
+            _HunspellPool(cmd, encoding, speller=load() if load else None),
+        )
+        _POOLS[key] = entry
+    return entry[1]
+
+
+def _line_chunks(fname, linenos=None, extract=True, chunk_size=1 << 20):
+    """Generate lists of number and text of file lines of about chunk_size bytes."""
+    chunk, size = [], 0
+    for num, line in _stream_lines(fname, linenos, extract):
+        chunk.append((num, line))
+        size += len(line) + 1
+        if size >= chunk_size:
+            yield chunk
+            chunk, size = [], 0
+    if chunk:
+        yield chunk
+
+
 def _make_abspath(value):
     """Homogenize files to have absolute paths."""
     value = value.strip()
@@ -168,58 +514,222 @@ def _make_abspath(value):
     return value
 
 
-def _read_file(fname):
-    """Return file lines as strings."""
-    with open(fname) as fobj:
-        for line in fobj:
-            yield _tostr(line).strip()
-
-
-def _shcmd(cmd, timeout=15):
-    """Safely execute shell command."""
-    delay = 1.0
-    obj = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if sys.hexversion < 0x03000000:
-        while (obj.poll() is None) and (timeout > 0):
-            time.sleep(delay)
-            timeout -= delay
-        if not timeout:
-            obj.kill()
-        stdout, stderr = obj.communicate()
-    else:
+def _misspelled_words(fname, lines, session, wcache, index=None):
+    """Return sorted misspelled words of number and text of lines."""
+    # First pass, Hunspell never joins characters across white space so
+    # each white space-separated chunk of text can be checked on its own
+    with timings.phase("first_pass", fname):
+        chunks = set(chunk for _, line in lines for chunk in line.split())
+        verdicts = _check_words(chunks, session, wcache, index)
+    words = [_cleanup_word(word) for verdict in verdicts for word in verdict]
+    words = sorted(list(set([word for word in words if word.strip()])))
+    # Second pass
+    with timings.phase("second_pass", fname):
+        verdicts = _check_words(words, session, wcache, index)
+    return sorted(list(set([word for verdict in verdicts for word in verdict])))
+
+
+def _python_lines(lines):
+    """
+    Generate number and comments and strings of Python source lines.
+
+    Lines are generated as soon as no later token can add text to them; the
+    tokenizer exceptions are raised if the source is invalid
+    """
+    text_tokens = [tokenize.COMMENT, tokenize.STRING]
+    # Python 3.12+ tokenizes f-strings in pieces
+    text_tokens.append(getattr(tokenize, "FSTRING_MIDDLE", tokenize.STRING))
+    readline = functools.partial(next, (line + "\n" for line in lines), "")
+    ldict = collections.defaultdict(list)
+    for token in tokenize.generate_tokens(readline):
+        if ldict and (min(ldict) < token[2][0]):
+            for num in sorted(num for num in ldict if num < token[2][0]):
+                yield num, " ".join(ldict.pop(num))
+        if token[0] in text_tokens:
+            for num, text in enumerate(token[1].split("\n"), token[2][0]):
+                ldict[num].append(text)
+    for num in sorted(ldict):
+        yield num, " ".join(ldict[num])
+
+
+def _python_text(lines):
+    """Return comments and strings of Python source, None if it is invalid."""
+    try:
+        return list(_python_lines(lines))
+    except (tokenize.TokenError, SyntaxError):
+        return None
+
+
+def _rst_text(lines):
+    """Generate reStructuredText lines without directives and code blocks."""
+    directive_regexp = re.compile(r"^(\s*)\.\.\s+([\w-]+)::")
+    literal_directives = [
+        "code",
+        "code-block",
+        "highlight",
+        "literalinclude",
+        "math",
+        "raw",
+        "sourcecode",
+    ]
+    indent, skip_body, in_options = None, False, False
+    for num, line in enumerate(lines, 1):
+        curr_indent = len(line) - len(line.lstrip())
+        if (indent is not None) and ((not line.strip()) or (curr_indent > indent)):
+            # Directive options go right after the directive line, its body
+            # (if any) after a blank line
+            in_options = in_options and bool(line.strip())
+            if skip_body or (in_options and line.strip().startswith(":")):
+                continue
+            yield num, line
+            continue
+        indent, skip_body, in_options = None, False, False
+        match = directive_regexp.match(line)
+        if match:
+            indent = len(match.group(1))
+            skip_body = match.group(2).lower() in literal_directives
+            in_options = True
+            continue
+        if line.rstrip().endswith("::"):
+            # Literal block
+            indent, skip_body = curr_indent, True
+        yield num, line
+
+
+def _shell_text(lines):
+    """Generate comments of shell script lines."""
+    for num, line in enumerate(lines, 1):
+        if (num == 1) and line.startswith("#!"):
+            continue
+        quote, escaped = None, False
+        for col, char in enumerate(line):
+            if escaped:
+                escaped = False
+            elif (char == "\\") and (quote != "'"):
+                escaped = True
+            elif quote:
+                quote = None if char == quote else quote
+            elif char in "'\"":
+                quote = char
+            elif (char == "#") and ((not col) or line[col - 1].isspace()):
+                yield num, line[col + 1 :]
+                break
+
+
+def _staged_lines():
+    """
+    Return line numbers added or modified by the staged change, per file.
+
+    Files are keyed by their real absolute path; None is returned if the
+    staged change could not be read
+    """
+    toplevel = _git("rev-parse", "--show-toplevel")
+    stdout = _git(
+        "-c",
+        "core.quotepath=off",
+        "diff",
+        "--cached",
+        "-U0",
+        "--no-color",
+        "--no-ext-diff",
+        "--no-prefix",
+    )
+    if (toplevel is None) or (stdout is None):
+        return None
+    toplevel = toplevel.strip()
+    hunk_regexp = re.compile(r"^@@ -\d+(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+    ret = collections.defaultdict(set)
+    fname, skip = None, 0
+    # Only newlines end diff lines, other line breaks can be in hunk bodies
+    for line in stdout.split("\n"):
+        # Hunk body lines could look like headers, skip them by count
+        if skip:
+            skip -= 0 if line.startswith("\\") else 1
+            continue
+        if line.startswith("+++ "):
+            # Git ends the header with a tab when the path has a space
+            path = line[4:-1] if line.endswith("\t") else line[4:]
+            if path.startswith('"') and path.endswith('"'):
+                path = codecs.escape_decode(path[1:-1].encode("utf-8"))[0]
+                path = path.decode("utf-8", "replace")
+            fname = None
+            if path != "/dev/null":
+                fname = os.path.realpath(os.path.join(toplevel, path))
+            continue
+        match = hunk_regexp.match(line)
+        if match:
+            old_count, start, new_count = match.groups()
+            old_count = 1 if old_count is None else int(old_count)
+            new_count = 1 if new_count is None else int(new_count)
+            skip = old_count + new_count
+            if fname:
+                ret[fname].update(range(int(start), int(start) + new_count))
+    return ret
+
+
+def _stream_lines(fname, linenos=None, extract=True):
+    """
+    Generate number and text of file lines, as _file_lines returns them.
+
+    Lines are decoded and extracted as they are generated
+    """
+    obj = content.get(fname)
+    if obj is None:
+        return
+    lines = lambda: (content.tostr(line) for line in obj.raw_lines())
+    extractors = {"python": _python_lines, "rst": _rst_text, "shell": _shell_text}
+    extractor = extractors.get(_text_type(fname)) if extract else None
+    if extractor is _python_lines:
+        # Invalid Python source is checked as is, which is only known after
+        # tokenizing all of it
         try:
-            stdout, stderr = obj.communicate(timeout=timeout)
-        except subprocess.TimeoutExpired:
-            obj.kill()
-            stdout, stderr = obj.communicate()
-    if obj.returncode:
-        print("COMMAND: " + (" ".join(cmd)))
-        print("STDOUT:" + os.linesep + _tostr(stdout))
-        print("STDERR:" + os.linesep + _tostr(stderr))
-        raise RuntimeError("hunspell command could not be executed successfully")
-    stdout = _tostr(stdout).split(os.linesep)
-    stderr = _tostr(stderr).split(os.linesep)
-    return stdout
+            collections.deque(_python_lines(lines()), maxlen=0)
+        except (tokenize.TokenError, SyntaxError):
+            extractor = None
+    for num, line in extractor(lines()) if extractor else enumerate(lines(), 1):
+        if (linenos is None) or (num in linenos):
+            yield num, line.strip()
 
 
-def _tostr(obj):  # pragma: no cover
-    """Convert to string if necessary."""
-    return obj if isinstance(obj, str) else (obj.decode() if IS_PY3 else obj.encode())
+def _text_type(fname):
+    """Return type of the prose text extractor of a file, empty if it has none."""
+    return {".py": "python", ".rst": "rst", ".sh": "shell"}.get(
+        os.path.splitext(fname)[1], ""
+    )
+
+
+def _tobytes(obj, encoding="utf-8"):  # pragma: no cover
+    """Convert to bytes if necessary."""
+    return obj if isinstance(obj, bytes) else obj.encode(encoding, "replace")
+
+
+def _word_index(fname, linenos=None, extract=True, lines=None):
+    """
+    Return line numbers in which each word of a file appears.
+
+    Words are maximal runs of ASCII letters, the same boundaries used by the
+    (.*[^a-zA-Z]|^)word([^a-zA-Z].*|$) line regular expression
+    """
+    regexp = re.compile(r"[a-zA-Z]+")
+    index = collections.defaultdict(list)
+    lines = _file_lines(fname, linenos, extract) if lines is None else lines
+    for num, line in lines:
+        for word in set(regexp.findall(line)):
+            index[word].append(str(num))
+    return index
 
 
 def _valid_file(value):
     """Check that a file exists and returned it converted to absolute path."""
     value = _make_abspath(value)
-    if not os.path.exists(value):
+    if not content.exists(value):
         raise argparse.ArgumentTypeError("File {0} does not exist".format(value))
     return value
 
 
+@timings.timed("spelling")
 def check_spelling(argv=None):
     """Run aspell and report line number in which misspelled words are."""
-    if not which("hunspell"):
-        print("hunspell not found, skipping spell checking")
-        return 0
     argv = sys.argv[1:] if argv is None else argv
     # Apparently the personal dictionary cannot be a relative path
     parser = argparse.ArgumentParser()
@@ -228,43 +738,154 @@ def check_spelling(argv=None):
     parser.add_argument("-p", nargs=1, type=_valid_file, required=False)
     parser.add_argument("-P", nargs=1, required=False)
     parser.add_argument("-e", "--exclude", nargs=1, type=_valid_file, required=False)
+    parser.add_argument("--cache-dir", nargs=1, required=False)
+    parser.add_argument("--cache-size", nargs=1, type=int, default=[10000])
+    parser.add_argument("--word-cache-size", nargs=1, type=int, default=[50000])
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--diff", "--staged-only", dest="diff", action="store_true")
+    parser.add_argument("--full-text", action="store_true")
+    parser.add_argument("--whitelist-index", nargs=1, type=_valid_file, required=False)
+    parser.add_argument("--chunk-size", nargs=1, type=int, default=[1 << 20])
+    parser.add_argument("--jobs", nargs=1, type=int, default=[cpu_count()])
+    parser.add_argument("--staged", action="store_true")
+    parser.add_argument(
+        "--engine", nargs=1, choices=["hunspell", "builtin"], default=["hunspell"]
+    )
     parser.add_argument("files", nargs="*", type=_valid_file)
     cli_args, cmd_args = parser.parse_known_args(argv)
     ###
+    builtin = cli_args.engine[0] == "builtin"
+    names = cli_args.d[0] if cli_args.d else _default_dictionary()
+    if (not builtin) and (not which("hunspell")):
+        print("hunspell not found, skipping spell checking")
+        return 0
+    if builtin and (not _dictionary_files(names)):
+        print("Dictionary {0} not found".format(names))
+        return 1
     fnames = cli_args.files
     if cli_args.exclude:
-        patterns = [_make_abspath(item) for item in _read_file(cli_args.exclude[0])]
-        exclude_filter = lambda x: not any(fnmatch(x, pattern) for pattern in patterns)
-        fnames = filter(exclude_filter, fnames)
+        with timings.phase("exclude"):
+            fnames = read_matcher(cli_args.exclude[0]).filter(fnames)
+    if cli_args.staged:
+        # The Git index is only read for staged runs
+        from pre_commit_hooks import staged
+
+        if staged.preload(fnames) is None:
+            parser.error("staged contents could not be read from the Git index")
     ###
     cmd_args += ["-d", cli_args.d[0]] if cli_args.d else []
     cmd_args += ["-i", cli_args.i[0]] if cli_args.i else []
     cmd_args += ["-p", cli_args.p[0]] if cli_args.p else []
     cmd_args += ["-P", cli_args.P[0]] if cli_args.P else []
+    cache_dir = cli_args.cache_dir[0] if cli_args.cache_dir else default_dir("spelling")
+    rcache, wcache, fingerprint = None, None, ""
+    use_cache = cache_dir and (not cli_args.no_cache)
+    if use_cache or daemon.serving():
+        fingerprint = _fingerprint(cmd_args, cli_args)
+    if use_cache:
+        rcache = open_cache(
+            os.path.join(cache_dir, "results.json"), cli_args.cache_size[0]
+        )
+        # Word verdicts only depend on the Hunspell configuration; files of
+        # earlier configurations are removed once a new one is written
+        words_fname = os.path.join(cache_dir, "words-{0}.json".format(fingerprint[:16]))
+        new_words = not os.path.exists(words_fname)
+        wcache = open_cache(words_fname, cli_args.word_cache_size[0])
+    timings.track_cache("results", rcache)
+    timings.track_cache("words", wcache)
+    # In diff mode only the lines added by the staged change are checked
+    with timings.phase("diff"):
+        changed = _staged_lines() if cli_args.diff else None
+    linenos = [
+        None if changed is None else changed.get(os.path.realpath(fname), set())
+        for fname in fnames
+    ]
+    with timings.phase("cache_lookup"):
+        keys = [
+            digest(
+                fingerprint,
+                file_digest(fname),
+                "" if lines is None else ",".join(str(num) for num in sorted(lines)),
+                # Files of different types with the same contents have
+                # different prose text
+                "full" if cli_args.full_text else "extract " + _text_type(fname),
+            )
+            if rcache
+            else None
+            for fname, lines in zip(fnames, linenos)
+        ]
+        results = [rcache.get(key) if rcache else None for key in keys]
+    pending = [
+        (fname, lines)
+        for fname, lines, result in zip(fnames, linenos, results)
+        if result is None
+    ]
+    jobs = max(1, min(cli_args.jobs[0], len(pending)))
     retval = 0
     base_cmd = ["hunspell"] + cmd_args + ["-l"]
-    for fname in fnames:
-        # First pass
-        stdout = _shcmd(base_cmd + [fname])
-        words = [_cleanup_word(word) for word in stdout if word.strip()]
-        words = sorted(list(set([word for word in words if word.strip()])))
-        # Second pass
-        func = lambda x: x.write(os.linesep.join(words))
-        with TmpFile(func) as temp_fname:
-            stdout = _shcmd(base_cmd + [temp_fname])
-        words = sorted(list(set([word.strip() for word in stdout if word.strip()])))
-        #
-        header_printed = False
-        if words:
-            retval = 1
-            ldict = _grep(fname, words)
-            if not header_printed:
-                print("Base command: " + (" ".join(base_cmd)))
-                header_printed = True
-            print(fname)
-            for word, lines in [(word, ldict[word]) for word in words]:
-                plural = "s" if len(lines) > 1 else ""
-                print("    {}: line{} {}".format(word, plural, ", ".join(lines)))
+    encoding = cli_args.i[0] if cli_args.i else "utf-8"
+    cmd = ["hunspell"] + cmd_args + ["-a"]
+    extract = not cli_args.full_text
+    index = None
+    if cli_args.whitelist_index:
+        index = WhitelistIndex(cli_args.whitelist_index[0])
+    load = None
+    if builtin:
+        personal = cli_args.p[0] if cli_args.p else None
+        load = functools.partial(
+            _builtin_speller, names, personal, cache_dir if use_cache else None
+        )
+    sessions = _hunspell_pool(cmd, encoding, fingerprint, load)
+    sessions.configure(wcache, extract, index, cli_args.chunk_size[0])
+    done = False
+    try:
+        pool = None
+        if jobs > 1:
+            from multiprocessing.pool import ThreadPool
+
+            pool = ThreadPool(jobs)
+        # Files are checked as a pool thread becomes available but reported
+        # in input order, so that output does not change from run to run
+        checked = (
+            pool.imap(lambda args: sessions.check_file(*args), pending)
+            if pool
+            else (sessions.check_file(*args) for args in pending)
+        )
+        try:
+            for fname, key, result in zip(fnames, keys, results):
+                if result is None:
+                    result = next(checked)
+                    if rcache:
+                        rcache.put(key, result)
+                header_printed = False
+                if result:
+                    retval = 1
+                    if not header_printed:
+                        print("Base command: " + (" ".join(base_cmd)))
+                        header_printed = True
+                    print(fname)
+                    for word, lines in result:
+                        plural = "s" if len(lines) > 1 else ""
+                        print(
+                            "    {}: line{} {}".format(word, plural, ", ".join(lines))
+                        )
+        finally:
+            if pool:
+                pool.terminate()
+                pool.join()
+        done = True
+    finally:
+        # An interrupted run may leave sessions half-way through a check
+        if not (done and daemon.serving()):
+            sessions.close()
+    if index is not None:
+        index.close()
+    if rcache:
+        with timings.phase("cache_save"):
+            rcache.save()
+            wcache.save()
+            if new_words and os.path.exists(words_fname):
+                remove_stale(words_fname, "words-*.json")
     return retval
 
 
@@ -0,0 +1,126 @@
+# staged.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111
+
+# Standard library imports
+import os
+import subprocess
+import threading
+
+# Intra-package imports
+from pre_commit_hooks import content, timings
+
+###
+# Global variables
+###
+# Index entry modes of symbolic links and submodules, which have no file
+# contents to check
+_SKIP_MODES = ("120000", "160000")
+
+
+###
+# Functions
+###
+def _git(*args):
+    """Return standard output of a Git command, None if it failed."""
+    timings.count("subprocesses")
+    try:
+        obj = subprocess.Popen(
+            ["git"] + list(args), stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+    except (IOError, OSError):
+        return None
+    stdout, _ = obj.communicate()
+    return None if obj.returncode else stdout
+
+
+def _read_blobs(names):
+    """Return contents of Git objects, keyed by object name."""
+    timings.count("subprocesses")
+    obj = subprocess.Popen(
+        ["git", "cat-file", "--batch"], stdin=subprocess.PIPE, stdout=subprocess.PIPE
+    )
+
+    def feed():
+        # Requests are written by another thread, so that neither process
+        # blocks on a full pipe
+        try:
+            for name in names:
+                obj.stdin.write(name.encode("ascii") + b"\n")
+        except (IOError, OSError):
+            pass
+        finally:
+            try:
+                obj.stdin.close()
+            except (IOError, OSError):
+                pass
+
+    writer = threading.Thread(target=feed)
+    writer.daemon = True
+    writer.start()
+    ret = {}
+    try:
+        for name in names:
+            fields = obj.stdout.readline().split()
+            if len(fields) != 3:
+                # Missing object
+                continue
+            size = int(fields[2])
+            data = obj.stdout.read(size + 1)[:size]
+            if fields[1] == b"blob":
+                ret[name] = data
+    finally:
+        writer.join()
+        obj.stdout.close()
+        obj.wait()
+    return ret
+
+
+def index_entries(fnames):
+    """
+    Return object names of files staged in the index, keyed by absolute path.
+
+    Files that are not in the index, have merge conflicts or are symbolic
+    links or submodules are left out; None is returned if the index could
+    not be read
+    """
+    toplevel = _git("rev-parse", "--show-toplevel")
+    stdout = _git("ls-files", "--stage", "-z", "--full-name")
+    if (toplevel is None) or (stdout is None):
+        return None
+    toplevel = content.tostr(toplevel).strip()
+    wanted = set(os.path.realpath(fname) for fname in fnames)
+    ret = {}
+    for entry in stdout.split(b"\0"):
+        if not entry:
+            continue
+        info, path = entry.split(b"\t", 1)
+        mode, name, stage = content.tostr(info).split()
+        fname = os.path.realpath(os.path.join(toplevel, content.tostr(path)))
+        if (fname in wanted) and (stage == "0") and (mode not in _SKIP_MODES):
+            ret[fname] = name
+    return ret
+
+
+def preload(fnames):
+    """
+    Memoize the staged contents of files in the content layer.
+
+    All blobs are read through one git cat-file process. Returns the files
+    whose staged contents were loaded, None if the index could not be read;
+    other files are read from the working tree as usual
+    """
+    with timings.phase("staged"):
+        entries = index_entries(fnames)
+        if entries is None:
+            return None
+        blobs = _read_blobs(sorted(set(entries.values())))
+        ret = []
+        for fname in fnames:
+            name = entries.get(os.path.realpath(fname))
+            if (name is not None) and (name in blobs):
+                content.pin(fname, blobs[name])
+                ret.append(fname)
+    timings.count("staged_files", len(ret))
+    return ret
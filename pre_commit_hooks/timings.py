@@ -0,0 +1,217 @@
+# timings.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,C0415,R0205
+
+# Standard library imports
+from __future__ import print_function
+import argparse
+import functools
+import sys
+import time
+
+###
+# Global variables
+###
+# Process CPU time, and per-thread CPU time of phases where available
+# (Python 3.7+)
+_PROCESS_TIME = getattr(time, "process_time", None) or getattr(time, "clock")
+_CPU_TIME = getattr(time, "thread_time", None) or _PROCESS_TIME
+# Active recorders and hooks being run, innermost last
+_RECORDERS = []
+_HOOKS = []
+
+
+###
+# Functions
+###
+def _options(argv):
+    """Split timing options from the rest of the hook arguments."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--timings", action="store_true")
+    parser.add_argument("--timings-output", nargs=1, required=False)
+    parser.add_argument("--profile", nargs=1, required=False)
+    return parser.parse_known_args(argv)
+
+
+def count(name, value=1):
+    """Add value to a counter of the active recorder, if any."""
+    if _RECORDERS:
+        _RECORDERS[-1].count(name, value)
+
+
+def phase(name, fname=None):
+    """
+    Return context manager that times a phase, optionally of a file.
+
+    Nothing is recorded, and the overhead is negligible, when timings are not
+    enabled
+    """
+    if _RECORDERS:
+        return _RECORDERS[-1].phase(name, fname)
+    return _NULL_PHASE
+
+
+def track_cache(name, cache):
+    """Report hit rate of an LruCache object at the end of the run."""
+    if _RECORDERS and (cache is not None):
+        _RECORDERS[-1].caches[name] = cache
+
+
+def timed(hook):
+    """
+    Decorate hook entry point to support timing and profiling options.
+
+    The --timings option writes a JSON report with wall and CPU time per phase
+    and per file, counters and cache hit rates to standard error (or to the
+    --timings-output file), and the --profile option dumps cProfile
+    statistics of the run to a file
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(argv=None):
+            argv = sys.argv[1:] if argv is None else argv
+            opts, argv = _options(argv)
+            _HOOKS.append(hook)
+            recorder = None
+            if opts.timings or opts.timings_output:
+                recorder = Recorder(hook)
+                _RECORDERS.append(recorder)
+            profiler = None
+            if opts.profile:
+                # Profiling is opt-in, cProfile is only imported if asked for
+                import cProfile
+
+                profiler = cProfile.Profile()
+                profiler.enable()
+            try:
+                return func(argv)
+            finally:
+                _HOOKS.pop()
+                if profiler is not None:
+                    profiler.disable()
+                    profiler.dump_stats(opts.profile[0])
+                if recorder is not None:
+                    _RECORDERS.remove(recorder)
+                    recorder.write(
+                        opts.timings_output[0] if opts.timings_output else None
+                    )
+
+        return wrapper
+
+    return decorator
+
+
+###
+# Classes
+###
+class Recorder(object):
+    """Wall and CPU time of phases, per file times, counters and caches."""
+
+    def __init__(self, hook):  # noqa
+        import threading
+
+        self.hook = hook
+        # Phases of hooks run by this one are prefixed with the hook name
+        self._depth = len(_HOOKS)
+        self.caches = {}
+        self._counters = {}
+        self._files = {}
+        self._lock = threading.Lock()
+        self._phases = {}
+        self._start = (time.time(), _PROCESS_TIME())
+
+    def count(self, name, value=1):
+        """Add value to a counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def phase(self, name, fname=None):
+        """Time a phase, optionally of a file."""
+        return _Phase(self, ".".join(_HOOKS[self._depth :] + [name]), fname)
+
+    def record(self, name, fname, wall, cpu):
+        """Add wall and CPU time of a phase run."""
+        with self._lock:
+            entry = self._phases.setdefault(name, {"calls": 0, "wall": 0.0, "cpu": 0.0})
+            entry["calls"] += 1
+            entry["wall"] += wall
+            entry["cpu"] += cpu
+            if fname is not None:
+                fentry = self._files.setdefault(fname, {})
+                fentry[name] = fentry.get(name, 0.0) + wall
+
+    def report(self):
+        """Return report as a dictionary."""
+        caches = {}
+        for name, cache in self.caches.items():
+            total = cache.hits + cache.misses
+            caches[name] = {
+                "hits": cache.hits,
+                "misses": cache.misses,
+                "hit_rate": round(float(cache.hits) / total, 4) if total else None,
+            }
+        files = dict(
+            (fname, dict(phases, total=sum(phases.values())))
+            for fname, phases in self._files.items()
+        )
+        return {
+            "hook": self.hook,
+            "wall": time.time() - self._start[0],
+            "cpu": _PROCESS_TIME() - self._start[1],
+            "phases": self._phases,
+            "files": files,
+            "slowest_files": sorted(
+                files, key=lambda x: files[x]["total"], reverse=True
+            )[:10],
+            "counters": self._counters,
+            "caches": caches,
+        }
+
+    def write(self, fname=None):
+        """Write JSON report to a file, or to standard error."""
+        import json
+
+        data = json.dumps(self.report(), indent=2, sort_keys=True)
+        if fname is None:
+            print(data, file=sys.stderr)
+        else:
+            with open(fname, "w") as fobj:
+                fobj.write(data + "\n")
+
+
+class _Phase(object):
+    """Context manager that times a phase for a recorder."""
+
+    def __init__(self, recorder, name, fname):  # noqa
+        self._recorder = recorder
+        self._name = name
+        self._fname = fname
+        self._start = None
+
+    def __enter__(self):  # noqa
+        self._start = (time.time(), _CPU_TIME())
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):  # noqa
+        self._recorder.record(
+            self._name,
+            self._fname,
+            time.time() - self._start[0],
+            _CPU_TIME() - self._start[1],
+        )
+        return False
+
+
+class _NullPhase(object):
+    """Context manager that does nothing."""
+
+    def __enter__(self):  # noqa
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):  # noqa
+        return not exc_type is not None
+
+
+_NULL_PHASE = _NullPhase()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# whitelist.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,R0205
+
+# Standard library imports
+from __future__ import print_function
+import argparse
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+
+###
+# Global variables
+###
+INDEX_MAGIC = b"PCHWLI1\n"
+
+
+###
+# Functions
+###
+def _read_whitelist(fname):
+    """Return language, encoding and words of a personal dictionary file."""
+    with open(fname, "rb") as fobj:
+        lines = fobj.read().splitlines()
+    lang, encoding = "en", "utf-8"
+    if lines and lines[0].startswith(b"personal_ws-"):
+        fields = lines.pop(0).decode("ascii", "replace").split()
+        lang = fields[1] if len(fields) > 1 else lang
+        encoding = fields[3] if len(fields) > 3 else encoding
+    words = [line.decode(encoding, "replace").strip() for line in lines]
+    return lang, encoding, [word for word in words if word]
+
+
+def _sort_key(word):
+    """Sort words case-insensitively, lower case first on ties."""
+    return word.lower(), word.swapcase()
+
+
+def _write_file(fname, data):
+    """Write file atomically."""
+    fdesc, tmp_fname = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(fname)), suffix=".tmp"
+    )
+    with os.fdopen(fdesc, "wb") as fobj:
+        fobj.write(data)
+    if os.path.exists(fname):
+        shutil.copymode(fname, tmp_fname)
+    else:
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_fname, 0o666 & ~umask)
+    # os.replace is not available in Python 2
+    getattr(os, "replace", os.rename)(tmp_fname, fname)
+
+
+def merge_whitelists(fnames):
+    """Return language, encoding and sorted unique words of whitelists."""
+    lang, encoding, words = None, None, set()
+    for fname in fnames:
+        flang, fencoding, fwords = _read_whitelist(fname)
+        lang, encoding = lang or flang, encoding or fencoding
+        words.update(fwords)
+    return lang or "en", encoding or "utf-8", sorted(words, key=_sort_key)
+
+
+def write_index(fname, words):
+    """
+    Write compiled whitelist index.
+
+    The index is the magic string, the number of words N and N + 1 offsets
+    (little-endian unsigned 32-bit integers) followed by the UTF-8 encoded
+    words concatenated in byte order, so that it can be memory-mapped and
+    binary-searched without parsing
+    """
+    words = sorted(set(word.encode("utf-8") for word in words))
+    offsets = [0]
+    for word in words:
+        offsets.append(offsets[-1] + len(word))
+    data = struct.pack("<{0}I".format(len(offsets) + 1), len(words), *offsets)
+    _write_file(fname, INDEX_MAGIC + data + b"".join(words))
+
+
+def write_whitelist(fname, words, lang="en", encoding="utf-8"):
+    """Write personal dictionary file with header."""
+    lines = ["personal_ws-1.1 {0} {1} {2}".format(lang, len(words), encoding)]
+    lines.extend(words)
+    _write_file(fname, ("\n".join(lines) + "\n").encode(encoding))
+
+
+class WhitelistIndex(object):
+    """
+    Memory-mapped compiled whitelist index.
+
+    Words are looked up by binary search directly on the mapped file
+    """
+
+    def __init__(self, fname):  # noqa
+        self._fobj = open(fname, "rb")
+        try:
+            self._data = mmap.mmap(self._fobj.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            self._data = b""
+        start = len(INDEX_MAGIC)
+        if self._data[:start] != INDEX_MAGIC:
+            self.close()
+            raise RuntimeError("File {0} is not a whitelist index".format(fname))
+        (self._count,) = struct.unpack_from("<I", self._data, start)
+        self._offsets = start + 4
+        self._words = self._offsets + 4 * (self._count + 1)
+
+    def __contains__(self, word):  # noqa
+        word = word.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            mid = (low + high) // 2
+            start, stop = struct.unpack_from("<2I", self._data, self._offsets + 4 * mid)
+            item = self._data[self._words + start : self._words + stop]
+            if item == word:
+                return True
+            if item < word:
+                low = mid + 1
+            else:
+                high = mid
+        return False
+
+    def __enter__(self):  # noqa
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):  # noqa
+        self.close()
+        return not exc_type is not None
+
+    def __len__(self):  # noqa
+        return self._count
+
+    def close(self):
+        """Unmap and close index file."""
+        if hasattr(self._data, "close"):
+            self._data.close()
+        self._fobj.close()
+
+
+def manage_whitelist(argv=None):
+    """Merge, sort and deduplicate whitelists, optionally compiling an index."""
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-o", "--output", nargs=1, required=False)
+    parser.add_argument("-i", "--index", nargs=1, required=False)
+    parser.add_argument("files", nargs="+")
+    cli_args = parser.parse_args(argv)
+    for fname in cli_args.files:
+        if not os.path.exists(fname):
+            print("File {0} does not exist".format(fname), file=sys.stderr)
+            return 1
+    lang, encoding, words = merge_whitelists(cli_args.files)
+    output = cli_args.output[0] if cli_args.output else cli_args.files[0]
+    write_whitelist(output, words, lang, encoding)
+    if cli_args.index:
+        write_index(cli_args.index[0], words)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(manage_whitelist(sys.argv[1:]))
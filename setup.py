@@ -31,11 +31,15 @@ setup(
     install_requires=[],
     entry_points={
         "console_scripts": [
-            "header = pre_commit_hooks.header:check_header",
-            "identity = pre_commit_hooks.identity:check_identity",
-            "pydocstyle_wrapper = pre_commit_hooks.pydocstyle_wrapper:check_pydocstyle",
-            "pylint_codes = pre_commit_hooks.pylint_codes:check_pylint_codes",
-            "spelling = pre_commit_hooks.spelling:check_spelling",
+            "checker_daemon = pre_commit_hooks.daemon:main",
+            "git_pre_commit = pre_commit_hooks.precommit:check_commit",
+            "header = pre_commit_hooks.client:check_header",
+            "identity = pre_commit_hooks.client:check_identity",
+            "pydocstyle_wrapper = pre_commit_hooks.client:check_pydocstyle",
+            "pylint_codes = pre_commit_hooks.client:check_pylint_codes",
+            "run_hooks = pre_commit_hooks.client:run_hooks",
+            "spelling = pre_commit_hooks.client:check_spelling",
+            "whitelist = pre_commit_hooks.whitelist:manage_whitelist",
         ]
     },
 )
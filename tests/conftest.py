@@ -0,0 +1,16 @@
+# conftest.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111
+
+# PyPI imports
+import pytest
+
+
+###
+# Fixtures
+###
+@pytest.fixture(autouse=True)
+def no_daemon(monkeypatch):
+    """Run hooks in the test process, never through a checker daemon."""
+    monkeypatch.setenv("PRE_COMMIT_HOOKS_NO_DAEMON", "1")
@@ -0,0 +1,123 @@
+# test_client.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,W0212
+
+# Standard library imports
+import os
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+
+# PyPI imports
+import pytest
+
+# Intra-package imports
+from pre_commit_hooks import client
+
+
+###
+# Global variables
+###
+# Modules a client may only import once a daemon socket is found, or when
+# it runs the hook itself
+DEFERRED = ["hashlib", "json", "pre_commit_hooks.header", "socket"]
+
+
+###
+# Helper functions
+###
+def _long_repo(tmpdir):
+    """Return Git directory whose daemon socket path is too long."""
+    git_dir = tmpdir.join(*(["x" * 30] * 4)).join(".git")
+    git_dir.ensure(dir=True)
+    return git_dir
+
+
+###
+# Test functions
+###
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix sockets only")
+def test_connect_checks_socket(tmpdir, monkeypatch):
+    """Test that only sockets owned by the current user are connected to."""
+    monkeypatch.delenv("PRE_COMMIT_HOOKS_NO_DAEMON")
+    path = str(tmpdir.join("d.sock"))
+    monkeypatch.setenv("PRE_COMMIT_HOOKS_SOCKET", path)
+    assert client._connect() is None
+    tmpdir.join("d.sock").write("")
+    assert client._connect() is None
+    os.remove(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.bind(path)
+        server.listen(1)
+        sock = client._connect()
+        assert sock is not None
+        sock.close()
+        monkeypatch.setattr(os, "getuid", lambda: os.lstat(path).st_uid + 1)
+        assert client._connect() is None
+    finally:
+        server.close()
+
+
+def test_environment(monkeypatch):
+    """Test that only environment variables hooks read are sent."""
+    monkeypatch.setenv("GIT_INDEX_FILE", "index")
+    monkeypatch.setenv("DICPATH", "/dicts")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "secret")
+    env = client._environment()
+    assert env["GIT_INDEX_FILE"] == "index"
+    assert env["DICPATH"] == "/dicts"
+    assert "AWS_SECRET_ACCESS_KEY" not in env
+
+
+def test_imports(tmpdir):
+    """Test that a client without a daemon only imports what it needs."""
+    pkg_dir = os.path.dirname(os.path.dirname(os.path.abspath(client.__file__)))
+    env = dict(os.environ, PYTHONPATH=pkg_dir)
+    env.pop("PRE_COMMIT_HOOKS_NO_DAEMON")
+    code = (
+        "import sys; from pre_commit_hooks import client; "
+        "client.socket_path(); client._connect(); "
+        "print(' '.join(sorted(sys.modules)))"
+    )
+    with tmpdir.as_cwd():
+        subprocess.check_call(["git", "init", "-q"])
+        modules = subprocess.check_output([sys.executable, "-c", code], env=env)
+    modules = modules.decode("ascii").split()
+    assert [name for name in DEFERRED if name in modules] == []
+
+
+def test_no_daemon(monkeypatch):
+    """Test that nothing is sent or computed when no daemon is running."""
+
+    def fail():
+        raise AssertionError("computed without a daemon")
+
+    monkeypatch.setattr(client, "_code_stamp", fail)
+    monkeypatch.setattr(client, "_environment", fail)
+    assert client.check_pylint_codes([]) == 0
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX only")
+def test_socket_path_private_dir(tmpdir, monkeypatch):
+    """Test that a long socket path falls back to a per-user private directory."""
+    monkeypatch.setattr(tempfile, "tempdir", str(tmpdir.mkdir("tmp")))
+    monkeypatch.setattr(client, "git_dir", lambda: str(_long_repo(tmpdir)))
+    path = client.socket_path()
+    sock_dir = os.path.dirname(path)
+    assert sock_dir == os.path.join(
+        tempfile.tempdir, "pre-commit-hooks-{0}".format(os.getuid())
+    )
+    fstat = os.lstat(sock_dir)
+    assert stat.S_ISDIR(fstat.st_mode)
+    assert fstat.st_uid == os.getuid()
+    assert not fstat.st_mode & 0o077
+    # A directory others can write to, or a link, is not used
+    os.chmod(sock_dir, 0o777)
+    assert client.socket_path() == ""
+    os.rmdir(sock_dir)
+    os.symlink(str(tmpdir), sock_dir)
+    assert client.socket_path() == ""
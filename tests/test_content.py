@@ -0,0 +1,31 @@
+# test_content.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111
+
+# Intra-package imports
+from pre_commit_hooks import content
+
+
+###
+# Test functions
+###
+def test_evict_in_use(tmpdir, monkeypatch):
+    """Test that contents evicted from the memo can still be used."""
+    monkeypatch.setattr(content, "_MEMO_FILES", 4)
+    content.clear()
+    big = tmpdir.join("big.txt")
+    big.write("line\n" * (content._MMAP_SIZE // 5 + 1))
+    obj = content.get(str(big))
+    assert not isinstance(obj.data, bytes)
+    # A pointer to the memory map, as the hash or regex functions hold
+    view = memoryview(obj.data)
+    for num in range(20):
+        small = tmpdir.join("f{0:03d}.txt".format(num))
+        small.write("text {0}\n".format(num))
+        assert content.get(str(small)).lines() == ["text {0}".format(num)]
+    assert not content.is_loaded(str(big))
+    assert sum(1 for _ in obj.raw_lines()) == obj.line_count()
+    assert view[:5].tobytes() == b"line\n"
+    view.release()
+    content.clear()
@@ -0,0 +1,76 @@
+# test_daemon.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111
+
+# Standard library imports
+import contextlib
+import os
+import socket
+import subprocess
+import threading
+import time
+
+# PyPI imports
+import pytest
+
+# Intra-package imports
+from pre_commit_hooks import client, daemon, identity
+
+
+###
+# Helper functions
+###
+@contextlib.contextmanager
+def _daemon(tmpdir, monkeypatch):
+    """Run the daemon in a thread of this process."""
+    monkeypatch.delenv("PRE_COMMIT_HOOKS_NO_DAEMON")
+    path = str(tmpdir.join("d.sock"))
+    monkeypatch.setenv("PRE_COMMIT_HOOKS_SOCKET", path)
+    thread = threading.Thread(target=daemon.serve, args=(path, 30))
+    thread.start()
+    try:
+        start = time.time()
+        while (not os.path.exists(path)) and (time.time() - start < 10):
+            time.sleep(0.05)
+        yield
+        # An out of date daemon would have stopped instead of running the hook
+        assert client.request({"command": "status"})["pid"] == os.getpid()
+    finally:
+        client.request({"command": "stop"})
+        thread.join(10)
+    assert not os.path.exists(path)
+
+
+###
+# Test functions
+###
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix sockets only")
+def test_identity_cache(tmpdir, monkeypatch, capsys):
+    """Test that the daemon keeps author indexes between identity runs."""
+    monkeypatch.setenv("HOME", str(tmpdir))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    monkeypatch.setenv("GIT_AUTHOR_NAME", "Jane Doe")
+    monkeypatch.setenv("GIT_AUTHOR_EMAIL", "jane@example.com")
+    authors = tmpdir.join("AUTHORS.rst")
+    authors.write("Authors\n=======\n\nJane Doe <jane@example.com>\n")
+    monkeypatch.setattr(identity, "_AUTHORS", {})
+    with _daemon(tmpdir, monkeypatch):
+        with tmpdir.as_cwd():
+            subprocess.check_call(["git", "init", "-q"])
+            assert client.check_identity(["-a", str(authors)]) == 0
+            index = identity._AUTHORS[str(authors)]
+            assert client.check_identity(["-a", str(authors)]) == 0
+            assert identity._AUTHORS[str(authors)] is index
+    assert capsys.readouterr().out == ""
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix sockets only")
+def test_serve(tmpdir, monkeypatch, capsys):
+    """Test that a client runs its hook in the daemon."""
+    fobj = tmpdir.join("module.py")
+    fobj.write("x = 1  # pylint: disable=C0103\n")
+    with _daemon(tmpdir, monkeypatch):
+        with tmpdir.as_cwd():
+            assert client.check_pylint_codes([str(fobj)]) == 1
+        assert "not on its own line" in capsys.readouterr().out
@@ -0,0 +1,119 @@
+# test_dictionary.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111
+
+# PyPI imports
+import pytest
+
+# Intra-package imports
+from pre_commit_hooks import content, dictionary
+from pre_commit_hooks.compat import which
+from pre_commit_hooks.spelling import _Hunspell, _builtin_speller
+
+
+###
+# Global variables
+###
+AFF = """SET UTF-8
+KEEPCASE K
+FORBIDDENWORD X
+NEEDAFFIX N
+
+PFX R Y 1
+PFX R   0     re         .
+
+PFX U N 1
+PFX U   0     un         .
+
+SFX D Y 3
+SFX D   0     d          e
+SFX D   y     ied        [^aeiou]y
+SFX D   0     ed         [^ey]
+
+SFX S Y 2
+SFX S   0     es         [sxzh]
+SFX S   0     s          [^sxzh]
+
+SFX L N 1
+SFX L   0     ly         .
+"""
+DIC = """9
+finish/RDS
+bake/RD
+copy/RDS
+kind/UL
+NASA/K
+bakeed/X
+walk/NDS
+the
+word
+"""
+CORRECT = [
+    "finish",
+    "finished",
+    "refinish",
+    "refinished",
+    "refinishes",
+    "rebaked",
+    "recopied",
+    "unkind",
+    "kindly",
+    "NASA",
+    "walked",
+    "walks",
+    "The",
+    "WORD",
+]
+WRONG = [
+    "unkindly",
+    "bakeed",
+    "Nasa",
+    "nasa",
+    "walk",
+    "rewalked",
+    "refinishd",
+]
+
+
+###
+# Helper functions
+###
+def _dictionary(tmpdir):
+    """Write test dictionary, return its name."""
+    tmpdir.join("en_T.aff").write(AFF)
+    tmpdir.join("en_T.dic").write(DIC)
+    return str(tmpdir.join("en_T"))
+
+
+###
+# Test functions
+###
+@pytest.mark.parametrize("indexed", [False, True])
+def test_speller(tmpdir, indexed):
+    """Test built-in engine verdicts, with cross products and options."""
+    name = _dictionary(tmpdir)
+    pairs = [(name + ".aff", name + ".dic")]
+    index_fname = str(tmpdir.join("dictionary.idx")) if indexed else None
+    try:
+        with dictionary.load_speller(pairs, index_fname=index_fname) as speller:
+            assert [word for word in CORRECT if not speller.spell(word)] == []
+            assert [word for word in WRONG if speller.spell(word)] == []
+    finally:
+        content.clear()
+
+
+@pytest.mark.skipif(not which("hunspell"), reason="Hunspell not installed")
+def test_conformance(tmpdir):
+    """Test that the built-in engine agrees with Hunspell."""
+    name = _dictionary(tmpdir)
+    words = CORRECT + WRONG
+    try:
+        with _Hunspell(["hunspell", "-d", name, "-a"]) as session:
+            reference = session.check(words)
+        with _builtin_speller(name) as speller:
+            builtin = speller.check(words)
+    finally:
+        content.clear()
+    assert builtin == reference
+    assert reference == [[]] * len(CORRECT) + [[word] for word in WRONG]
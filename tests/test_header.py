@@ -0,0 +1,116 @@
+# test_header.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111
+
+# Standard library imports
+import datetime
+
+# PyPI imports
+import pytest
+
+# Intra-package imports
+from pre_commit_hooks import content
+from pre_commit_hooks.header import check_header
+
+
+###
+# Global variables
+###
+HEADERRC = (
+    "{comment} {basename}\n"
+    r"{comment} Copyright \(c\) (2019-{current_year}|{current_year}) Pablo "
+    "Acosta-Serafini\n"
+    "{comment} See LICENSE for details\n"
+)
+
+
+###
+# Test functions
+###
+@pytest.mark.parametrize("encoding, retval", [("utf-8", 0), ("latin-1", 1)])
+def test_encoding_line(tmpdir, encoding, retval):
+    """Test that only the UTF-8 encoding line is skipped, as the plugin does."""
+    tmpdir.join(".headerrc").write(HEADERRC)
+    fobj = tmpdir.join("module.py")
+    notice = "# Copyright (c) 2019-{0} Pablo Acosta-Serafini"
+    lines = [
+        "# -*- coding: {0} -*-".format(encoding),
+        "# module.py",
+        notice.format(datetime.datetime.now().year),
+        "# See LICENSE for details",
+        "",
+    ]
+    fobj.write("\n".join(lines))
+    assert check_header([str(fobj)]) == retval
+
+
+@pytest.mark.parametrize(
+    "docstring",
+    [
+        ['"""Module docstring."""'],
+        ['"""', "Module docstring.", '"""'],
+        ['"""Module', "docstring.", '"""'],
+    ],
+)
+def test_fix_after_docstring(tmpdir, docstring):
+    """Test that the header is fixed after a shebang and module docstring."""
+    tmpdir.join(".headerrc").write(HEADERRC)
+    fobj = tmpdir.join("script.py")
+    head = ["#!/usr/bin/env python", "# -*- coding: utf-8 -*-"] + docstring
+    notice = "# Copyright (c) 2019-{0} Pablo Acosta-Serafini"
+    old = ["# scripts.py", notice.format(datetime.datetime.now().year)]
+    fobj.write("\n".join(head + old + ["# See LICENSE for details", "x = 1", ""]))
+    fname = str(fobj)
+    assert check_header([fname]) == 1
+    assert check_header(["--fix", "--jobs", "1", fname]) == 1
+    content.clear()
+    lines = fobj.read().splitlines()
+    assert lines[: len(head)] == head
+    assert lines[len(head) :][0] == "# script.py"
+    assert lines[len(head) :][1:] == old[1:] + ["# See LICENSE for details", "x = 1"]
+    assert check_header([fname]) == 0
+
+
+@pytest.mark.parametrize(
+    "basename, shebang",
+    [
+        ("script.py", "#!/usr/bin/env python"),
+        ("script.py", "#!/usr/bin/python"),
+        ("script.sh", "#!/bin/bash"),
+        ("script.sh", "#!/usr/bin/env bash"),
+    ],
+)
+def test_fix_keeps_shebang(tmpdir, basename, shebang):
+    """Test that the header is inserted after the shebang line."""
+    tmpdir.join(".headerrc").write(HEADERRC)
+    fobj = tmpdir.join(basename)
+    fobj.write(shebang + "\necho = 1\n")
+    fname = str(fobj)
+    assert check_header(["--fix", "--jobs", "1", fname]) == 1
+    content.clear()
+    lines = fobj.read().splitlines()
+    assert lines[0] == shebang
+    assert lines[1] == "# " + basename
+    assert lines[-1] == "echo = 1"
+    assert check_header([fname]) == 0
+
+
+@pytest.mark.parametrize(
+    "basename, shebang",
+    [
+        ("script.py", "#!/usr/bin/env python3"),
+        ("script.sh", "#!/bin/sh"),
+        ("script.sh", "#! /bin/zsh -e"),
+    ],
+)
+def test_fix_unknown_shebang(tmpdir, basename, shebang):
+    """Test that a file with a shebang line the check rejects is not moved."""
+    tmpdir.join(".headerrc").write(HEADERRC)
+    fobj = tmpdir.join(basename)
+    text = shebang + "\necho = 1\n"
+    fobj.write(text)
+    fname = str(fobj)
+    assert check_header(["--fix", "--jobs", "1", fname]) == 1
+    content.clear()
+    assert fobj.read() == text
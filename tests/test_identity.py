@@ -0,0 +1,32 @@
+# test_identity.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111
+
+# Standard library imports
+import subprocess
+
+# Intra-package imports
+from pre_commit_hooks.identity import check_identity
+
+
+###
+# Test functions
+###
+def test_committer_opt_in(tmpdir, monkeypatch):
+    """Test that the committer identity is only checked when asked to."""
+    monkeypatch.setenv("HOME", str(tmpdir))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    for var in ["GIT_AUTHOR_NAME", "GIT_AUTHOR_EMAIL", "GIT_CONFIG_PARAMETERS"]:
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setenv("GIT_COMMITTER_NAME", "Someone Else")
+    monkeypatch.setenv("GIT_COMMITTER_EMAIL", "someone@example.com")
+    repo = tmpdir.mkdir("repo")
+    authors = repo.join("AUTHORS.rst")
+    authors.write("Authors\n=======\n\nJane Doe <jane@example.com>\n")
+    with repo.as_cwd():
+        subprocess.check_call(["git", "init", "-q"])
+        subprocess.check_call(["git", "config", "user.name", "Jane Doe"])
+        subprocess.check_call(["git", "config", "user.email", "jane@example.com"])
+        assert check_identity(["-a", str(authors)]) == 0
+        assert check_identity(["-a", str(authors), "--committer"]) == 1
@@ -0,0 +1,102 @@
+# test_pylint_codes.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,W0212
+
+# Standard library imports
+import tokenize
+
+# PyPI imports
+import pytest
+
+# Intra-package imports
+from pre_commit_hooks import content, pylint_codes
+
+
+###
+# Global variables
+###
+# Directive-like text in strings and docstrings is not a directive
+TOKENIZED = '''"""
+Module docstring.
+
+# pylint: disable=W0612,C0111
+"""
+# pylint: disable=C0111,W0212
+TEXT = "# pylint: disable=C0111"
+x = 1  # pylint: disable=C0103
+
+
+def func():
+    # pylint: disable=W0613,R0201
+    """Docstring, # pylint: disable=W0212."""
+    # pylint: disable=R0201,W0212
+'''
+# Source that cannot be tokenized, checked line by line
+UNTOKENIZED = """# pylint: disable=C0111,W0212
+x = 1  # pylint: disable=C0103
+    # pylint: disable=W0613,R0201
+    # pylint: disable=R0201,W0212
+y = (
+"""
+MESSAGES = [
+    "Pylint disable directive not on its own line",
+    "codes not sorted: W0613,R0201",
+    "codes repeated: R0201,W0212",
+]
+
+
+###
+# Test functions
+###
+@pytest.mark.parametrize(
+    "text, diagnostics",
+    [
+        (TOKENIZED, list(zip([8, 12, 14], MESSAGES))),
+        (UNTOKENIZED, list(zip([2, 3, 4], MESSAGES))),
+        ("x = 1\n# no directives\n", []),
+    ],
+)
+def test_check_pylint_codes(tmpdir, text, diagnostics):
+    """Test per-line diagnostics of tokenized and untokenized files."""
+    fobj = tmpdir.join("module.py")
+    fobj.write(text)
+    try:
+        assert pylint_codes._check_pylint_codes(str(fobj)) == diagnostics
+    finally:
+        content.clear()
+
+
+def test_line_directives(tmpdir):
+    """Test that source that cannot be tokenized is checked line by line."""
+    fobj = tmpdir.join("module.py")
+    fobj.write(UNTOKENIZED)
+    obj = content.get(str(fobj))
+    try:
+        linenos = pylint_codes._candidate_lines(obj)
+        assert linenos == set([1, 2, 3, 4])
+        with pytest.raises(tokenize.TokenError):
+            pylint_codes._token_directives(obj, linenos)
+        assert [item[:2] for item in pylint_codes._line_directives(obj, linenos)] == [
+            (1, True),
+            (2, False),
+            (3, True),
+            (4, True),
+        ]
+    finally:
+        content.clear()
+
+
+def test_output(tmpdir, capsys):
+    """Test that diagnostics are reported by file and line."""
+    fobj = tmpdir.join("module.py")
+    fobj.write(TOKENIZED)
+    fname = str(fobj)
+    try:
+        assert pylint_codes.check_pylint_codes([fname]) == 1
+    finally:
+        content.clear()
+    assert capsys.readouterr().out.splitlines() == ["    " + fname] + [
+        "        line {0}: {1}".format(num, msg)
+        for num, msg in zip([8, 12, 14], MESSAGES)
+    ]
@@ -0,0 +1,170 @@
+# test_spelling.py
+# Copyright (c) 2019 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,W0212
+
+# Standard library imports
+import collections
+import os
+import re
+import stat
+import subprocess
+import sys
+import time
+
+# PyPI imports
+import pytest
+
+# Intra-package imports
+from pre_commit_hooks import spelling
+
+
+###
+# Global variables
+###
+FIXTURE = (
+    "Teh quick brown fox, teh QUICK fox and Teh fox.\n"
+    "Concatenate cat cats Cat; cat-like (cat) cat's\n"
+    "\n"
+    "teh teh teh\n"
+    "word2word word_word wordword 'word' \"Word\"\n"
+    "recieve recieved recieve, Recieve\n"
+)
+# Hunspell pipe mode stand-in that only finds "teh" misspelled
+STUB = """#!{0}
+import re
+import sys
+sys.stdout.write("@(#) International Ispell Version 3.2.06\\n")
+sys.stdout.flush()
+for line in sys.stdin:
+    if line.startswith("^"):
+        for match in re.finditer(r"\\bteh\\b", line):
+            sys.stdout.write("# teh {{0}}\\n".format(match.start() - 1))
+        sys.stdout.write("\\n")
+        sys.stdout.flush()
+"""
+
+
+###
+# Helper functions
+###
+def _regex_grep(fname, words):
+    """Return line numbers in which words appear, as the regex search did."""
+    pat = "(.*[^a-zA-Z]|^){}([^a-zA-Z].*|$)"
+    regexps = [(word, re.compile(pat.format(word))) for word in words]
+    ldict = collections.defaultdict(list)
+    with open(fname) as fobj:
+        for num, line in enumerate(fobj.read().splitlines()):
+            for word in [word for word, regexp in regexps if regexp.match(line)]:
+                ldict[word].append(str(num + 1))
+    return ldict
+
+
+def _stub_hunspell(tmpdir, monkeypatch):
+    """Put Hunspell stand-in first in the executable search path."""
+    bin_dir = tmpdir.mkdir("bin")
+    _write_script(str(bin_dir.join("hunspell")), STUB.format(sys.executable))
+    monkeypatch.setenv("PATH", str(bin_dir) + os.pathsep + os.environ["PATH"])
+
+
+def _write_script(fname, text):
+    """Write executable script."""
+    with open(fname, "w") as fobj:
+        fobj.write(text)
+    os.chmod(fname, os.stat(fname).st_mode | stat.S_IXUSR)
+    return fname
+
+
+###
+# Test functions
+###
+def test_grep(tmpdir):
+    """Test that the word index finds the lines the regex search found."""
+    fname = str(tmpdir.join("fixture.txt"))
+    with open(fname, "w") as fobj:
+        fobj.write(FIXTURE)
+    words = [
+        "Teh",
+        "teh",
+        "QUICK",
+        "cat",
+        "Cat",
+        "cats",
+        "word",
+        "Word",
+        "wordword",
+        "recieve",
+        "Recieve",
+        "recieved",
+        "missing",
+    ]
+    assert dict(spelling._grep(fname, words)) == dict(_regex_grep(fname, words))
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX shell needed")
+@pytest.mark.parametrize(
+    "script",
+    [
+        "#!/bin/sh\nexec sleep 60\n",
+        "#!/bin/sh\necho '@(#) International Ispell Version 3.2.06'\nexec sleep 60\n",
+    ],
+)
+def test_hunspell_timeout(tmpdir, monkeypatch, script):
+    """Test that a Hunspell session that does not answer is killed."""
+    monkeypatch.setattr(spelling, "_TIMEOUT", 1)
+    cmd = _write_script(str(tmpdir.join("hunspell")), script)
+    start = time.time()
+    with spelling._Hunspell([cmd, "-a"]) as session:
+        with pytest.raises(RuntimeError) as excinfo:
+            session.check(["hello world"])
+    assert "did not finish in 1 seconds" in str(excinfo.value)
+    assert time.time() - start < 10
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX executable stub needed")
+def test_result_cache_file_type(tmpdir, monkeypatch, capsys):
+    """Test that same-content files of different types do not share results."""
+    _stub_hunspell(tmpdir, monkeypatch)
+    cache_dir = str(tmpdir.join("cache"))
+    for ext in [".py", ".txt"]:
+        tmpdir.join("a" + ext).write("x = 1  # teh\nteh = 2\n")
+    with tmpdir.as_cwd():
+        spelling.check_spelling(["--no-cache", "a.txt"])
+        expected = capsys.readouterr().out
+        assert "teh: lines 1, 2" in expected
+        spelling.check_spelling(["--cache-dir", cache_dir, "a.py"])
+        assert "teh: line 1\n" in capsys.readouterr().out
+        spelling.check_spelling(["--cache-dir", cache_dir, "a.txt"])
+        assert capsys.readouterr().out == expected
+
+
+def test_staged_lines(tmpdir):
+    """Test that added lines are found in files with spaces and quotes."""
+    fnames = ["plain.rst", "my file.rst", 'quo"te.rst', "tab\tname.rst"]
+    if sys.platform == "win32":
+        fnames = fnames[:2]
+    with tmpdir.as_cwd():
+        subprocess.check_call(["git", "init", "-q"])
+        for fname in fnames:
+            with open(fname, "w") as fobj:
+                fobj.write("one\ntwo\nthree\n")
+        subprocess.check_call(["git", "add"] + fnames)
+        ret = spelling._staged_lines()
+        assert dict(ret) == dict(
+            (os.path.realpath(fname), set([1, 2, 3])) for fname in fnames
+        )
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX executable stub needed")
+def test_word_cache_files(tmpdir, monkeypatch):
+    """Test that word caches of earlier configurations are removed."""
+    _stub_hunspell(tmpdir, monkeypatch)
+    cache_dir = tmpdir.join("cache")
+    fname = tmpdir.join("file.txt")
+    fname.write("Some text\n")
+    for num in range(3):
+        whitelist = tmpdir.join("whitelist{0}.pws".format(num))
+        whitelist.write("personal_ws-1.1 en 1 utf-8\nword{0}\n".format(num))
+        argv = ["--cache-dir", str(cache_dir), "-p", str(whitelist), str(fname)]
+        assert spelling.check_spelling(argv) == 0
+        assert len(cache_dir.listdir("words-*.json")) == 1